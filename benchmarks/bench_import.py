@@ -0,0 +1,71 @@
+"""Import-time benchmark and regression guard.
+
+python benchmarks/bench_import.py [-n 10] [--budget 0.15]
+
+Each measurement runs in a fresh interpreter. Exits with 1 if the median time of
+`import libwon; from libwon import COLLECTOR` exceeds the budget or if any heavy
+dependency is imported on the way.
+"""
+import os
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+HEAVY = ["torch", "numpy", "pandas", "requests", "asyncio"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import libwon
+from libwon import COLLECTOR
+t = time.perf_counter() - t
+print(t)
+print(",".join(m for m in %r if m in sys.modules))
+""" % (HEAVY,)
+
+
+def measure_once(snippet=SNIPPET):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run(
+        [sys.executable, "-c", snippet],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split("\n")
+    loaded = [m for m in out[1].split(",") if m]
+    return float(out[0]), loaded
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=0.15)
+    args = parser.parse_args(args)
+
+    times = []
+    loaded = set()
+    for _ in range(args.n):
+        t, mods = measure_once()
+        times.append(t)
+        loaded.update(mods)
+    med = statistics.median(times)
+    print(
+        f"import libwon: median={med * 1000:.1f}ms min={min(times) * 1000:.1f}ms "
+        f"max={max(times) * 1000:.1f}ms budget={args.budget * 1000:.0f}ms"
+    )
+    ok = True
+    if loaded:
+        print(f"FAIL heavy modules imported: {sorted(loaded)}")
+        ok = False
+    if med > args.budget:
+        print("FAIL import time over budget")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Overhead of TRACER spans.
+
+python benchmarks/bench_trace.py [-n 200000] [--budget_us 5]
+
+Times an empty loop, a loop of disabled spans, of enabled spans, of nested
+spans and of decorated calls, and exits with 1 if an enabled span costs more
+than the budget.
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libwon.utils.trace import Tracer  # noqa: E402
+
+
+def per_iter(f, n):
+    t = perf_counter()
+    f(n)
+    return (perf_counter() - t) / n * 1e6
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("-n", type=int, default=200000)
+    parser.add_argument("--budget_us", type=float, default=5.0)
+    args = parser.parse_args(args)
+    n = args.n
+    tracer = Tracer(max_events=n)
+
+    def bare(n):
+        for _ in range(n):
+            pass
+
+    def spans(n):
+        for _ in range(n):
+            with tracer.span("step"):
+                pass
+
+    def nested(n):
+        for _ in range(n // 2):
+            with tracer.span("outer"):
+                with tracer.span("inner"):
+                    pass
+
+    @tracer.span("call")
+    def call():
+        pass
+
+    def calls(n):
+        for _ in range(n):
+            call()
+
+    base = per_iter(bare, n)
+    tracer.enabled = False
+    disabled = per_iter(spans, n) - base
+    tracer.enabled = True
+    enabled = per_iter(spans, n) - base
+    nest = per_iter(nested, n) - base
+    deco = per_iter(calls, n) - base
+    print(f"span disabled : {disabled:.3f} us")
+    print(f"span enabled  : {enabled:.3f} us")
+    print(f"span nested   : {nest:.3f} us per span")
+    print(f"decorated call: {deco:.3f} us")
+    print(f"aggregates    : {tracer.summary()['step']}")
+    if enabled > args.budget_us:
+        print("FAIL span overhead over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""Benchmark suite of libwon with machine-readable output and baseline comparison.
+
+python benchmarks/suite.py [--quick] [-k collector] [--repeat 3]
+    [--out results.json] [--baseline baseline.json] [--tolerance 0.3]
+
+Every case is timed repeat times after an untimed setup and the best time is
+kept. --out writes the results as json, --baseline compares with such a file
+and exits with 1 if a case got slower than (1 + tolerance) times its baseline
+(cases under --min_seconds in both runs are too noisy to fail).
+Typical use: save a baseline on the main branch, then compare a change with it
+on the same machine.
+    python benchmarks/suite.py --out baseline.json
+    python benchmarks/suite.py --baseline baseline.json
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = []
+
+
+def case(name, sizes, quick):
+    """
+    register f(size, tmp) -> run, the setup is untimed and run() is timed
+    @ sizes, quick : sizes of a full run and of a --quick run
+    """
+
+    def register(f):
+        CASES.append((name, list(sizes), list(quick), f))
+        return f
+
+    return register
+
+
+def quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _grid(size):
+    """a grid list of about size configs with one overlapping dict"""
+    keys = []
+    n = size
+    while n > 1:
+        keys.append(min(10, n))
+        n //= 10
+    grid = {f"k{i}": range(v) for i, v in enumerate(keys)}
+    return [grid, {**grid, "k0": [0]}]
+
+
+def _paralleler(tmp, grid_list):
+    from libwon.utils.para import ParallelerGrid
+
+    with quiet():
+        return ParallelerGrid([0], grid_list, os.path.join(tmp, "log"), "true")
+
+
+@case("grid.iter_configs", [10**5, 10**6, 10**7], [10**5])
+def bench_iter_configs(size, tmp):
+    p = _paralleler(tmp, _grid(size))
+    return lambda: sum(1 for _ in p.iter_configs())
+
+
+@case("grid.get_configs", [10**5, 10**6], [10**5])
+def bench_get_configs(size, tmp):
+    p = _paralleler(tmp, _grid(size))
+    return lambda: len(p.get_configs())
+
+
+def _exp_tree(p, configs):
+    """80% finished, 10% running and 10% unstarted runs"""
+    for i, cfg in enumerate(configs):
+        if i % 10 == 9:
+            continue
+        d = os.path.join(p.exp_dir, p.cfg2dirname(cfg))
+        os.makedirs(d, exist_ok=True)
+        open(os.path.join(d, "cmd.txt"), "w").write("true")
+        if i % 10 != 8:
+            json.dump(
+                {"all_time": [1.0 + i % 7], "acc": [0.5]},
+                open(os.path.join(d, p.finish_file), "w"),
+            )
+
+
+@case("para.check_finish.cold", [10**4, 10**5], [10**4])
+def bench_check_finish_cold(size, tmp):
+    p = _paralleler(tmp, {"a": range(size // 10), "b": range(10)})
+    configs = p.get_configs()
+    _exp_tree(p, configs)
+
+    def run():
+        with quiet():
+            p.check_finish(False, full=True, configs=configs)
+
+    return run
+
+
+@case("para.check_finish.warm", [10**4, 10**5], [10**4])
+def bench_check_finish_warm(size, tmp):
+    p = _paralleler(tmp, {"a": range(size // 10), "b": range(10)})
+    configs = p.get_configs()
+    _exp_tree(p, configs)
+    with quiet():
+        p.check_finish(False, full=True, configs=configs)
+
+    def run():
+        with quiet():
+            p.check_finish(False, configs=configs)
+
+    return run
+
+
+@case("para.get_run_time", [10**4, 10**5], [10**4])
+def bench_get_run_time(size, tmp):
+    p = _paralleler(tmp, {"a": range(size // 10), "b": range(10)})
+    configs = p.get_configs()
+    _exp_tree(p, configs)
+    p.get_run_time(configs)
+    return lambda: p.get_run_time(configs)
+
+
+@case("results.refresh.cold", [10**4], [10**3])
+def bench_results_cold(size, tmp):
+    p = _paralleler(tmp, {"a": range(size // 10), "b": range(10)})
+    _exp_tree(p, p.get_configs())
+
+    def run():
+        with quiet():
+            p.results(cache=False).refresh()
+
+    return run
+
+
+@case("results.refresh.warm", [10**4], [10**3])
+def bench_results_warm(size, tmp):
+    p = _paralleler(tmp, {"a": range(size // 10), "b": range(10)})
+    _exp_tree(p, p.get_configs())
+    with quiet():
+        p.results().refresh()
+
+    def run():
+        with quiet():
+            p.results().refresh()
+
+    return run
+
+
+def _collector():
+    from libwon.utils.collector import Collector
+
+    c = Collector()
+    c.mute = True
+    return c
+
+
+@case("collector.add", [10**6], [10**5])
+def bench_collector_add(size, tmp):
+    c = _collector()
+
+    def run():
+        for i in range(size):
+            c.add("loss", i * 0.5)
+
+    return run
+
+
+@case("collector.add.buffered", [10**6], [10**5])
+def bench_collector_add_buffered(size, tmp):
+    c = _collector()
+    c.buffered()
+
+    def run():
+        for i in range(size):
+            c.add("loss", i * 0.5)
+        c.flush()
+
+    return run
+
+
+@case("collector.save", [10**6], [10**5])
+def bench_collector_save(size, tmp):
+    c = _collector()
+    for i in range(size):
+        c.add("loss", i * 0.5)
+    path = os.path.join(tmp, "collector.json")
+    return lambda: c.save(path)
+
+
+@case("collector.load", [10**6], [10**5])
+def bench_collector_load(size, tmp):
+    c = _collector()
+    for i in range(size):
+        c.add("loss", i * 0.5)
+    path = os.path.join(tmp, "collector.json")
+    c.save(path)
+    return lambda: _collector().load(path)
+
+
+def _batch(size):
+    import torch
+
+    def node(depth):
+        if depth == 0:
+            return [torch.randn(8), torch.arange(4), torch.randn(2, 3)]
+        return {"x": node(depth - 1), "y": (node(depth - 1), torch.ones(1))}
+
+    leaves = 0
+    depth = 0
+    while leaves < size:  # ~ size tensors
+        depth += 1
+        leaves = 4 * 2**depth
+    return node(depth)
+
+
+def _target():
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "meta"
+
+
+@case("misc.move_to", [256, 4096], [256])
+def bench_move_to(size, tmp):
+    from libwon.utils.misc import move_to
+
+    batch, device = _batch(size), _target()
+    return lambda: move_to(batch, device)
+
+
+@case("misc.move_to.batched", [256, 4096], [256])
+def bench_move_to_batched(size, tmp):
+    from libwon.utils.misc import move_to
+
+    batch, device = _batch(size), _target()
+    return lambda: move_to(batch, device, batched=True)
+
+
+def _source_tree(root, size):
+    """size .py files, and a .git dir of as many objects"""
+    for i in range(size):
+        d = os.path.join(root, f"pkg{i % 50}")
+        os.makedirs(d, exist_ok=True)
+        open(os.path.join(d, f"m{i}.py"), "w").write(f"x = {i}\n" * 50)
+        g = os.path.join(root, ".git", "objects", f"{i % 256:02x}")
+        os.makedirs(g, exist_ok=True)
+        open(os.path.join(g, f"o{i}"), "wb").write(os.urandom(512))
+
+
+@case("misc.cp_pys", [2000, 20000], [2000])
+def bench_cp_pys(size, tmp):
+    from libwon.utils.misc import cp_pys
+
+    src = os.path.join(tmp, "src")
+    _source_tree(src, size)
+    dst = os.path.join(tmp, "dst")
+
+    def run():
+        shutil.rmtree(dst, ignore_errors=True)
+        with quiet():
+            cp_pys(src, dst)
+
+    return run
+
+
+@case("snapshot.warm", [2000, 20000], [2000])
+def bench_snapshot(size, tmp):
+    from libwon.utils.snapshot import SnapshotStore
+
+    src = os.path.join(tmp, "src")
+    _source_tree(src, size)
+    store = SnapshotStore(os.path.join(tmp, "scripts"))
+    with quiet():
+        store.snapshot([src])
+
+    def run():
+        with quiet():
+            store.snapshot([src])
+
+    return run
+
+
+def _noop(dev, cfg):
+    return None
+
+
+@case("mp.mp_exec.noop", [1000, 10000], [1000])
+def bench_mp_exec(size, tmp):
+    from libwon.utils.mp import mp_exec
+
+    def run():
+        with quiet():
+            mp_exec([0] * 8, list(range(size)), _noop)
+
+    return run
+
+
+@case("mp.mp_exec.command", [100], [20])
+def bench_mp_exec_command(size, tmp):
+    from libwon.utils.mp import Command, mp_exec
+
+    def run():
+        with quiet():
+            mp_exec([0] * 8, list(range(size)), lambda dev, cfg: Command(["true"]))
+
+    return run
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_cases(quick, pattern, repeat):
+    results = {}
+    for name, sizes, quick_sizes, f in CASES:
+        if pattern and pattern not in name:
+            continue
+        for size in quick_sizes if quick else sizes:
+            key = f"{name}[{size}]"
+            tmp = tempfile.mkdtemp(prefix="libwon_bench_")
+            try:
+                try:
+                    run = f(size, tmp)
+                except ImportError as e:
+                    print(f"{key:40s} skipped : {e}")
+                    continue
+                times = []
+                for _ in range(repeat):
+                    t = perf_counter()
+                    run()
+                    times.append(perf_counter() - t)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            results[key] = dict(seconds=min(times), times=times, size=size)
+            print(f"{key:40s} {min(times):10.4f} s")
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds=0.01):
+    """@ return : the keys slower than (1 + tolerance) times their baseline"""
+    slower = []
+    print(f"{'case':40s} {'baseline':>10s} {'now':>10s} {'ratio':>7s}")
+    for key, r in results.items():
+        b = baseline["results"].get(key)
+        if b is None:
+            print(f"{key:40s} {'-':>10s} {r['seconds']:10.4f}")
+            continue
+        ratio = r["seconds"] / max(b["seconds"], 1e-9)
+        flag = ""
+        if ratio > 1 + tolerance and r["seconds"] > min_seconds:
+            flag = " SLOWER"
+            slower.append(key)
+        print(f"{key:40s} {b['seconds']:10.4f} {r['seconds']:10.4f} {ratio:7.2f}{flag}")
+    return slower
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("-k", type=str, default=None, help="cases containing k")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", type=str, default=None)
+    parser.add_argument("--baseline", type=str, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--min_seconds", type=float, default=0.01)
+    args = parser.parse_args(args)
+    results = run_cases(args.quick, args.k, args.repeat)
+    report = dict(
+        meta=dict(
+            time=time.time(),
+            commit=_commit(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpus=os.cpu_count(),
+            quick=args.quick,
+        ),
+        results=results,
+    )
+    if args.out:
+        json.dump(report, open(args.out, "w"), indent=1)
+    if args.baseline:
+        baseline = json.load(open(args.baseline))
+        slower = compare(results, baseline, args.tolerance, args.min_seconds)
+        if slower:
+            print(f"FAIL {len(slower)} cases regressed : {', '.join(slower)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ from libwon.utils import get_arg_dict, setup_seed
 import os
 from argparse import ArgumentParser
 import json
+import random
 parser = ArgumentParser()
 parser.add_argument('--device_id', type = str, default = "0")
 parser.add_argument('--log_dir', type = str, default = "../logs/tmp")
@@ -16,11 +17,14 @@ log_dir = args.log_dir
 info_dict = get_arg_dict(args)
 json.dump(info_dict, open(os.path.join(log_dir, 'args.json'),'w'),indent=2)
 print(args)
+COLLECTOR.stream(os.path.join(log_dir, 'collector.json'))
 
 # run
 setup_seed(args.seed)
 def run(args):
     COLLECTOR.add("info", args.info)
+    for epoch in range(5):
+        COLLECTOR.add("val_acc", random.random())
 run(args)
 
 # post logs
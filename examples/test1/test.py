@@ -1,7 +1,5 @@
 import os
-from libwon import COLLECTOR, ParallelerGrid
-import pandas as pd
-import json
+from libwon import ParallelerGrid
 
 grid_list = [
     {"seed": range(3), "info":[1]},
@@ -20,30 +18,11 @@ log_dir = os.path.join("../../logs/", dir, os.path.splitext(fname)[0])
 
 class Parallel(ParallelerGrid):
     def show(self, c):
-        exp_dir = self.exp_dir
-        ana_dir = self.ana_dir
-        cols = ParallelerGrid.collect_keys(grid_list)
-        print("Columns", cols)
-        files = os.listdir(exp_dir)
-        res = {}
-        for fname in files:
-            folder = os.path.join(exp_dir, fname)
-            info = json.load(open(os.path.join(folder, "args.json")))
-            hp = tuple([info[k] for k in cols])
-            try:
-                COLLECTOR.load(os.path.join(exp_dir, fname, "collector.json"))
-                cache = COLLECTOR.cache
-                res[hp] = cache
-            except Exception as e:
-                print(e)
-
-        if c == 0:
-            table = []
-            metrics = ['info']
-            for k,v in res.items():
-                table.append([*k]+[v[m][0] for m in metrics])
-            df = pd.DataFrame(table, columns= cols + metrics)
-            print(df)
+        res = self.results()    # finished runs as a pandas table, cached in ana_dir
+        if c == 0:              # last value of every metric per run
+            print(res.last())
+        elif c == 1:            # mean/std over seeds of the best epoch of each run
+            print(res.group(res.best_epoch("val_acc"), over="seed"))
 
 parallel = Parallel(
     gpus = gpus,
@@ -1,2 +1,22 @@
-from .utils.para import ParallelerGrid
-from .utils.collector import COLLECTOR
\ No newline at end of file
+import importlib
+
+# resolved on first access so that `from libwon import COLLECTOR` in a launched
+# job does not import the scheduler (and vice versa)
+_LAZY = {
+    "ParallelerGrid": ".utils.para",
+    "COLLECTOR": ".utils.collector",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,3 +1,27 @@
-from .mp import *
+import importlib
 from .misc import *
 from .collector import *
+from .trace import *
+
+# the scheduler pulls in asyncio, so it is only imported when used
+_LAZY = {
+    name: ".mp"
+    for name in ["dummy_func", "dummy_config", "Command", "mp_exec", "mp_exec_trial"]
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+# star imports also export the lazy names, as `from .mp import *` did
+__all__ = [n for n in globals() if not n.startswith("_") and n != "importlib"]
+__all__ += list(_LAZY)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
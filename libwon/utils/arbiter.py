@@ -0,0 +1,205 @@
+import os
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from .auth import authkey_file
+
+# per-user secret of the arbiter and its sweeps, other users of the node can
+# neither lease its devices nor send it pickles
+KEY_FILE = "~/.libwon/arbiter.key"
+
+
+class Arbiter:
+    """
+    Node-local daemon leasing device slots to concurrent sweeps.
+    A free slot goes to the waiting sweep with the fewest leases per priority
+    (weighted fair share), ties broken by who waited longest. Leases of a sweep
+    whose connection drops are released.
+    @ devices : slots, repeat a device id to run several jobs on it
+    @ address : (host, port) to listen on
+    @ authkey : secret of the sweeps, None for the key of key_file
+    @ key_file : key file, see auth.authkey_file, shared for a 0640 key of the
+        group of the file, e.g. several users sharing the node
+    @ stale : seconds after which a sweep that stopped asking is no longer waiting
+    """
+
+    def __init__(
+        self,
+        devices,
+        address=("localhost", 6200),
+        authkey=None,
+        stale=30,
+        key_file=KEY_FILE,
+        shared=False,
+    ):
+        self.devices = list(devices)
+        self.free = deque(self.devices)
+        self.address = tuple(address)
+        self.authkey = authkey or authkey_file(key_file, shared)
+        self.stale = stale
+        self.clients = {}  # name -> dict(priority, held, waiting)
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def _candidate(self):
+        now = time.time()
+        waiting = [
+            (c["held"] / c["priority"], c["waiting"], name)
+            for name, c in self.clients.items()
+            if c["waiting"] is not None and now - c["waiting_poll"] < self.stale
+        ]
+        return min(waiting)[2] if waiting else None
+
+    def acquire(self, name):
+        with self.lock:
+            c = self.clients[name]
+            now = time.time()
+            if c["waiting"] is None:
+                c["waiting"] = now
+            c["waiting_poll"] = now
+            if not self.free or self._candidate() != name:
+                return None
+            dev = self.free.popleft()
+            c["held"] += 1
+            c["waiting"] = None
+            return dev
+
+    def release(self, name, dev):
+        with self.lock:
+            self.clients[name]["held"] -= 1
+            self.free.append(dev)
+
+    def status(self):
+        with self.lock:
+            return {
+                "free": list(self.free),
+                "clients": {n: dict(c) for n, c in self.clients.items()},
+            }
+
+    def _handle(self, conn):
+        name, leases = None, []
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == "hello":
+                    name = msg[1]
+                    with self.lock:
+                        self.clients[name] = dict(
+                            priority=max(msg[2], 1e-6),
+                            held=0,
+                            waiting=None,
+                            waiting_poll=0,
+                        )
+                    reply = ("ok", len(self.devices))
+                elif msg[0] == "acquire":
+                    dev = self.acquire(name)
+                    if dev is not None:
+                        leases.append(dev)
+                    reply = ("dev", dev)
+                elif msg[0] == "release":
+                    leases.remove(msg[1])
+                    self.release(name, msg[1])
+                    reply = ("ok",)
+                elif msg[0] == "status":
+                    reply = ("status", self.status())
+                else:
+                    reply = ("error", f"unknown message {msg[0]}")
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            if name is not None:
+                for dev in leases:
+                    self.release(name, dev)
+                with self.lock:
+                    self.clients.pop(name, None)
+                if leases:
+                    print(f"Arbiter : {name} gone, release {leases}")
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:  # listener closed
+                return
+            except Exception as e:  # failed handshake
+                print(f"Arbiter : reject connection {e!r}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+        print(f"Arbiter : leasing {self.devices} on {self.address}")
+        return self
+
+    def close(self):
+        self.listener.close()
+
+
+class ArbiterPool:
+    """
+    Resource pool of mp_exec leasing slots from an Arbiter instead of owning them.
+    @ address : (host, port) of the arbiter
+    @ priority : weight of this sweep in the fair share
+    @ authkey : secret of the arbiter, None for the key of key_file
+    @ key_file, shared : key file of the arbiter, see Arbiter
+    @ poll : seconds between asking again for a slot
+    """
+
+    def __init__(
+        self,
+        address=("localhost", 6200),
+        priority=1,
+        authkey=None,
+        name=None,
+        poll=2.0,
+        key_file=KEY_FILE,
+        shared=False,
+    ):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll = poll
+        authkey = authkey or authkey_file(key_file, shared)
+        self.conn = Client(tuple(address), authkey=authkey)
+        self.size = self._request("hello", self.name, priority)[1]
+
+    def _request(self, *msg):
+        self.conn.send(msg)
+        return self.conn.recv()
+
+    def __len__(self):
+        return self.size
+
+    def acquire(self, cost=None):
+        return self._request("acquire")[1]
+
+    def release(self, dev, cost=None):
+        self._request("release", dev)
+
+    def full(self):
+        return False
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="node-local gpu arbiter for ParallelerGrid")
+    parser.add_argument("--devices", type=str, nargs="+", required=True)
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6200)
+    parser.add_argument("--authkey_file", type=str, default=KEY_FILE)
+    parser.add_argument(
+        "--shared", action="store_true", help="a 0640 key shared by the file group"
+    )
+    args = parser.parse_args()
+    key = authkey_file(args.authkey_file, args.shared)
+    Arbiter(args.devices, (args.host, args.port), key).start()
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,39 @@
+import os
+
+
+def authkey_file(path, shared=False):
+    """
+    Secret of the multiprocessing connections of the coordinator and arbiter:
+    they unpickle what they receive, so only holders of the key may connect.
+    @ path : key file, created with 32 random bytes readable by its owner only
+        (0600) if missing
+    @ shared : the key of a group, e.g. the sweeps of several users sharing one
+        arbiter, created 0640 and also accepted readable by the group of the file
+    @ return : the key
+    """
+    path = os.path.expanduser(path)
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, mode=0o750 if shared else 0o700, exist_ok=True)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            if shared:  # the umask may clear the group bits of os.open
+                os.fchmod(f.fileno(), 0o640)
+            f.write(os.urandom(32).hex())
+        try:
+            os.link(tmp, path)  # fails if another process created it first
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    mode = os.stat(path).st_mode
+    if mode & (0o037 if shared else 0o077):
+        allowed = "640" if shared else "600"
+        raise PermissionError(f"{path} is accessible by other users, chmod {allowed} it")
+    with open(path) as f:
+        key = f.read().strip()
+    if not key:
+        raise ValueError(f"{path} holds no key")
+    return key.encode()
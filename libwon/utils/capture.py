@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+import time
+from collections import deque
+from .halving import LINE
+
+
+class OutputCapture:
+    """
+    Output of a job read by the launcher instead of redirected to a file.
+    It is gzip-compressed into log_dir/<name>.gz, rotated to <name>.1.gz ...
+    <name>.<backups>.gz every max_bytes of output, and its last lines are kept
+    in memory (tail). The "COLLECTOR Epoch NNN : key=value" lines are parsed
+    as they arrive into metrics.jsonl ([key, value] lines, as a streamed
+    collector) and progress.json (epoch and last values) for "-t check".
+    @ max_bytes : uncompressed bytes per log file
+    @ flush_interval : seconds between flushes, so that a running log is readable
+    """
+
+    def __init__(
+        self,
+        log_dir,
+        name="log_out.txt",
+        max_bytes=64 << 20,
+        backups=3,
+        tail=200,
+        flush_interval=5.0,
+    ):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, name + ".gz")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lines = deque(maxlen=tail)
+        self.flush_interval = flush_interval
+        self.partial = b""
+        self.written = 0
+        self.file = None
+        self.metrics = None
+        self.progress = dict(epoch=None, values={}, lines=0)
+        self.flushed = time.time()
+
+    def _rotated(self, i):
+        return self.path[:-3] + f".{i}.gz"
+
+    def _open(self):
+        self.file = gzip.open(self.path, "wb", compresslevel=6)
+        self.written = 0
+
+    def _rotate(self):
+        self.file.close()
+        last = self._rotated(self.backups)
+        if os.path.exists(last):
+            os.remove(last)
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._rotated(i)):
+                os.replace(self._rotated(i), self._rotated(i + 1))
+        if self.backups > 0:
+            os.replace(self.path, self._rotated(1))
+        self._open()
+
+    def open(self):
+        for i in range(1, self.backups + 1):  # a relaunch starts a fresh log
+            if os.path.exists(self._rotated(i)):
+                os.remove(self._rotated(i))
+        self._open()
+        self.metrics = open(os.path.join(self.log_dir, "metrics.jsonl"), "w")
+        return self
+
+    def feed(self, data):
+        """@ data : bytes read from the job"""
+        if self.file is None:
+            self.open()
+        if self.written + len(data) > self.max_bytes and self.written:
+            self._rotate()
+        self.file.write(data)
+        self.written += len(data)
+        data = self.partial + data
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+        for line in data[:end].decode(errors="replace").splitlines():
+            self._line(line)
+        if time.time() - self.flushed > self.flush_interval:
+            self.flush()
+
+    def _line(self, line):
+        self.lines.append(line)
+        self.progress["lines"] += 1
+        m = LINE.match(line)
+        if m is None:
+            return
+        epoch, key, value = int(m.group(1)), m.group(2), m.group(3)
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        if self.progress["epoch"] is None or epoch > self.progress["epoch"]:
+            self.progress["epoch"] = epoch
+        self.progress["values"][key] = value
+        self.metrics.write(json.dumps([key, value]) + "\n")
+
+    def flush(self):
+        self.flushed = time.time()
+        self.file.flush()  # a sync flush, the log so far decompresses
+        self.metrics.flush()
+        tmp = os.path.join(self.log_dir, "progress.json.tmp")
+        json.dump(dict(self.progress, time=self.flushed), open(tmp, "w"))
+        os.replace(tmp, os.path.join(self.log_dir, "progress.json"))
+
+    def close(self):
+        if self.file is None:
+            self.open()
+        if self.partial:
+            self._line(self.partial.decode(errors="replace"))
+            self.partial = b""
+        self.flush()
+        self.file.close()
+        self.metrics.close()
+
+    def tail(self, n=None, metrics=True):
+        """@ metrics : False to leave out the COLLECTOR lines, e.g. to show an error"""
+        lines = [l for l in self.lines if metrics or LINE.match(l) is None]
+        return "\n".join(lines if n is None else lines[-n:])
+
+
+def read_progress(log_dir):
+    """progress.json of a captured job, None if there is none"""
+    try:
+        return json.load(open(os.path.join(log_dir, "progress.json")))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_output(log_dir, name="log_out.txt", backups=3):
+    """text of the captured output kept, oldest first, tolerating a running log"""
+    paths = [os.path.join(log_dir, f"{name}.{i}.gz") for i in range(backups, 0, -1)]
+    paths.append(os.path.join(log_dir, name + ".gz"))
+    out = []
+    for p in paths:
+        if not os.path.exists(p):
+            continue
+        d = gzip.GzipFile(p)
+        chunks = []
+        try:
+            for chunk in iter(lambda: d.read(1 << 16), b""):
+                chunks.append(chunk)
+        except (EOFError, OSError):  # the job is still writing it
+            pass
+        out.append(b"".join(chunks).decode(errors="replace"))
+    return "".join(out)
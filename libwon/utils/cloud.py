@@ -1,12 +1,188 @@
-import requests
-def send_autodl(title="", name="exp", content="done", token = ""):
-    resp = requests.post(
-        "https://www.autodl.com/api/v1/wechat/message/push",
-        json={
-            "token": f"{token}",
-            "title": f"{title}",
-            "name": f"{name}",
-            "content": f"{content}",
-        },
-    )
-    return resp.content.decode()
+import queue
+import threading
+import time
+
+AUTODL_URL = "https://www.autodl.com/api/v1/wechat/message/push"
+
+
+class AutodlTransport:
+    """
+    Posts messages to the autodl wechat push api through one pooled session.
+    @ url : endpoint, e.g. a local stub server in tests
+    @ timeout : (connect, read) seconds of each post
+    """
+
+    def __init__(self, token="", url=AUTODL_URL, timeout=(5, 15)):
+        self.token = token
+        self.url = url
+        self.timeout = timeout
+        self.session = None
+
+    def send(self, title, name, content):
+        """@ return : the response text, raises if the post failed"""
+        if self.session is None:
+            import requests
+
+            self.session = requests.Session()
+        resp = self.session.post(
+            self.url,
+            json={
+                "token": f"{self.token}",
+                "title": f"{title}",
+                "name": f"{name}",
+                "content": f"{content}",
+            },
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return resp.content.decode()
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+class PrintTransport:
+    """prints the messages instead of sending them, e.g. to try the events"""
+
+    def send(self, title, name, content):
+        print(f"Notice [{name}] {title} : {content}")
+        return ""
+
+
+class Notifier:
+    """
+    Sends notifications from a background thread, so a slow or unreachable
+    server never blocks the launcher. Messages arriving within coalesce seconds
+    of each other are sent as one digest, a failed send is retried with
+    exponential backoff and dropped after retries attempts.
+    @ transport : object with send(title, name, content), e.g. AutodlTransport
+    @ max_queue : pending messages kept, the oldest are dropped beyond it
+    """
+
+    def __init__(
+        self,
+        transport,
+        title="",
+        name="exp",
+        coalesce=2.0,
+        max_batch=50,
+        retries=3,
+        backoff=1.0,
+        max_queue=1000,
+    ):
+        self.transport = transport
+        self.title = title
+        self.name = name
+        self.coalesce = coalesce
+        self.max_batch = max_batch
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(max_queue)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def notify(self, content, title=None):
+        """enqueue a message, @ return : immediately"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+        item = (title or self.title, str(content))
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _batch(self, first):
+        """first and the messages following it within coalesce seconds"""
+        batch = [first]
+        deadline = time.time() + self.coalesce
+        while len(batch) < self.max_batch:
+            wait = deadline - time.time()
+            if wait <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                break
+            if item is None:  # closing, send what we have first
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    @staticmethod
+    def digest(batch):
+        """@ return : (title, content) of one message standing for the batch"""
+        if len(batch) == 1:
+            return batch[0]
+        title = f"{batch[0][0]} ({len(batch)} events)".strip()
+        return title, "\n".join(content for _, content in batch)
+
+    def _send(self, title, content):
+        for attempt in range(self.retries + 1):
+            try:
+                self.transport.send(title, self.name, content)
+                self.sent += 1
+                return True
+            except Exception as e:
+                if attempt == self.retries:
+                    self.failed += 1
+                    print(f"Notice failed after {attempt + 1} attempts : {e!r}")
+                    return False
+                time.sleep(min(self.backoff * 2**attempt, 60))
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self._send(*self.digest(self._batch(item)))
+
+    def close(self, timeout=30):
+        """send the pending messages, waiting at most timeout seconds"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"Notice : gave up on {self.queue.qsize()} pending messages")
+        elif hasattr(self.transport, "close"):
+            self.transport.close()
+
+
+def make_notifier(phone_notice):
+    """
+    @ phone_notice : kwargs of send_autodl, plus an optional transport replacing
+        autodl, timeout and the kwargs of Notifier
+    @ return : Notifier, None if phone_notice is empty
+    """
+    if not phone_notice:
+        return None
+    opts = dict(phone_notice)
+    opts.pop("content", None)
+    opts.pop("events", None)
+    token = opts.pop("token", "")
+    timeout = opts.pop("timeout", (5, 15))
+    transport = opts.pop("transport", None)
+    if transport is None:
+        transport = AutodlTransport(token, timeout=timeout)
+    return Notifier(transport, **opts)
+
+
+def send_autodl(title="", name="exp", content="done", token="", timeout=(5, 15)):
+    """send one message now, see Notifier to send without blocking"""
+    return AutodlTransport(token, timeout=timeout).send(title, name, content)
@@ -0,0 +1,209 @@
+"""
+Binary collector file (.lwc), written by Collector.save when the path ends with
+.lwc, so that readers load only the keys they need.
+
+    header   b"LWCOL\\x00\\x01\\x00"
+    blocks   one per key, 8-byte aligned: raw little-endian int64/float64 values
+             for numeric lists, utf-8 json for anything else
+    footer   json {"version": 1, "keys": {key: entry}}, an entry has the type,
+             offset and size of its block, the count and the last value
+    trailer  footer length as uint64, b"LWCOLEND"
+
+python -m libwon.utils.colfile DIR [DIR ...] [--name collector.json] [--keep]
+converts every collector json file under the dirs to .lwc.
+"""
+import array
+import json
+import os
+import struct
+import sys
+
+MAGIC = b"LWCOL\x00\x01\x00"
+END = b"LWCOLEND"
+EXT = ".lwc"
+_TRAILER = struct.Struct("<Q8s")
+_INT64 = (-(2**63), 2**63 - 1)
+
+
+def binary_path(path):
+    """the .lwc file standing for a collector json path"""
+    return os.path.splitext(path)[0] + EXT
+
+
+def resolve(path):
+    """path if it exists, else its .lwc version if that exists, else path"""
+    if not os.path.exists(path) and os.path.exists(binary_path(path)):
+        return binary_path(path)
+    return path
+
+
+def is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _numeric(values):
+    """@ return : array typecode of a list of numbers, None if not all numbers"""
+    code = "q"
+    for v in values:
+        t = type(v)
+        if t is float:
+            code = "d"
+        elif t is not int or not _INT64[0] <= v <= _INT64[1]:
+            return None
+    return code
+
+
+def _last(values):
+    if not values:
+        return None
+    v = values[-1]
+    if isinstance(v, (int, float, str)) or v is None:
+        return v
+    return None
+
+
+def save_binary(path, cache):
+    """
+    @ cache : {key: list of values or Series}, numeric lists become arrays, a
+        Series also writes its stats under key + "_stats" as Collector.save does
+    """
+    items = []
+    for key, values in cache.items():
+        if hasattr(values, "stats"):
+            items += [(key, values.tolist()), (f"{key}_stats", [values.stats()])]
+        else:
+            items.append((key, values))
+    keys = {}
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for key, values in items:
+            offset = f.tell()
+            code = _numeric(values) if values else None
+            if code is not None:
+                a = array.array(code, values)
+                if sys.byteorder == "big":
+                    a.byteswap()
+                f.write(a.tobytes())
+                entry = dict(type="array", dtype="<i8" if code == "q" else "<f8")
+            else:
+                f.write(json.dumps(values).encode())
+                entry = dict(type="json")
+            entry.update(
+                offset=offset, nbytes=f.tell() - offset, count=len(values)
+            )
+            entry["last"] = _last(values)
+            keys[key] = entry
+            f.write(b"\0" * (-f.tell() % 8))
+        footer = json.dumps(dict(version=1, keys=keys)).encode()
+        f.write(footer)
+        f.write(_TRAILER.pack(len(footer), END))
+
+
+def read_footer(path):
+    """@ return : {key: entry} of a .lwc file, reading only its end"""
+    with open(path, "rb") as f:
+        f.seek(-_TRAILER.size, os.SEEK_END)
+        n, end = _TRAILER.unpack(f.read(_TRAILER.size))
+        if end != END:
+            raise ValueError(f"{path} is no complete collector file")
+        f.seek(-_TRAILER.size - n, os.SEEK_END)
+        return json.loads(f.read(n))["keys"]
+
+
+def load_binary(path, keys=None, mmap=False):
+    """
+    @ keys : keys to load, None for all
+    @ mmap : numeric keys as read-only numpy memmaps instead of lists
+    """
+    entries = read_footer(path)
+    if keys is not None:
+        entries = {k: entries[k] for k in keys if k in entries}
+    cache = {}
+    with open(path, "rb") as f:
+        for key, e in entries.items():
+            if e["type"] == "array" and mmap:
+                import numpy as np
+
+                cache[key] = np.memmap(
+                    path,
+                    dtype=e["dtype"],
+                    mode="r",
+                    offset=e["offset"],
+                    shape=(e["count"],),
+                )
+                continue
+            f.seek(e["offset"])
+            data = f.read(e["nbytes"])
+            if e["type"] == "array":
+                a = array.array("q" if e["dtype"] == "<i8" else "d")
+                a.frombytes(data)
+                if sys.byteorder == "big":
+                    a.byteswap()
+                cache[key] = a.tolist()
+            else:
+                cache[key] = json.loads(data)
+    return cache
+
+
+def read_summary(path):
+    """last numeric value of every key, from the footer alone for .lwc files"""
+    path = resolve(path)
+    if is_binary(path):
+        items = ((k, e["last"]) for k, e in read_footer(path).items())
+    else:
+        cache = json.load(open(path))
+        items = ((k, v[-1] if v else None) for k, v in cache.items())
+    return {
+        k: v
+        for k, v in items
+        if isinstance(v, (int, float)) and not isinstance(v, bool)
+    }
+
+
+def convert(path, keep=False):
+    """write the .lwc version of a collector json file, @ return : its path"""
+    out = binary_path(path)
+    tmp = out + ".tmp"
+    save_binary(tmp, json.load(open(path)))
+    os.replace(tmp, out)
+    if not keep:
+        os.remove(path)
+    return out
+
+
+def _convert(args):
+    path, keep = args
+    try:
+        convert(path, keep)
+        return None
+    except Exception as e:
+        return f"{path} : {e!r}"
+
+
+def main(args=None):
+    from argparse import ArgumentParser
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = ArgumentParser(description="convert collector json files to .lwc")
+    parser.add_argument("dirs", nargs="+")
+    parser.add_argument("--name", type=str, default="collector.json")
+    parser.add_argument("--keep", action="store_true", help="keep the json files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(args)
+    paths = []
+    for d in args.dirs:
+        for root, _, files in os.walk(d):
+            if args.name in files:
+                paths.append(os.path.join(root, args.name))
+    with ProcessPoolExecutor(args.workers) as pool:
+        jobs = [(p, args.keep) for p in paths]
+        errors = [e for e in pool.map(_convert, jobs) if e]
+    for e in errors:
+        print(f"Convert : cannot convert {e}")
+    print(f"Converted {len(paths) - len(errors)} of {len(paths)} files")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,91 @@
+import atexit
 import json
-import torch
-import numpy as np
+import os
+import sys
+import threading
 import time
+from collections import deque
+from .series import Series
+from .trace import TRACER
+
+
+def log_path(path):
+    """the append log streamed next to the final collector file"""
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+def read_log(path):
+    """
+    rebuild a cache from an append log, skipping records torn by a crash.
+    A record [key, value, "set"] replaces the values of key, e.g. the stats of
+    a bounded Series.
+    """
+    cache = {}
+    torn = 0
+    with open(path) as f:
+        lines = f.read().split("\n")
+    for line in lines:
+        if not line:
+            continue
+        try:
+            key, value, *op = json.loads(line)
+        except ValueError:
+            torn += 1
+            continue
+        if op == ["set"]:
+            cache[key] = [value]
+        else:
+            cache.setdefault(key, []).append(value)
+    if torn:
+        print(f"COLLECTOR skipped {torn} torn records of {path}")
+    return cache
+
+
+def tensors_to_py(items):
+    """
+    (key, value) pairs with tensors replaced by python numbers/lists, the 0-d
+    tensors of one device and dtype are copied to cpu together in one transfer
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return items
+    items = list(items)
+    groups = {}
+    for i, (k, v) in enumerate(items):
+        if isinstance(v, torch.Tensor):
+            if v.dim() == 0:
+                groups.setdefault((v.device, v.dtype), []).append(i)
+            else:
+                items[i] = (k, v.cpu().tolist())
+    for pos in groups.values():
+        values = torch.stack([items[i][1] for i in pos]).cpu().tolist()
+        for i, v in zip(pos, values):
+            items[i] = (items[i][0], v)
+    return items
+
+
 class Collector:
-    def __init__(self):
+    def __init__(self, tracer=None):
+        """
+        @ tracer : Tracer whose span aggregates save adds under "timing", its
+            Chrome trace is written as trace.json next to the collector file
+        """
+        self.tracer = tracer
         self.cache = {}
         self.init_time = time.time()
         self.mute = False
+        self._log = None
+        self._log_path = None
+        self._sync_interval = 0
+        self._last_sync = 0
+        self._stale = set()  # bounded Series keys whose stats are not streamed yet
+        self._queue = None
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = None
+        self._print_rate = 0
+        self._printed = (0, 0)  # (second, lines printed in it)
+        self._suppressed = 0
 
     def value2str(self,value):
         if isinstance(value, float):
@@ -18,30 +97,238 @@ class Collector:
         return f"{value}"
     
     def __getitem__(self, key):
+        self.flush()
         return self.cache[key]
 
     def add(self, key, value):
+        if self._queue is not None:
+            if hasattr(value, "detach"):  # drop the graph, no device sync
+                value = value.detach()
+            self._queue.append((key, value))
+            return
+        self._record(key, value)
+
+    def _record(self, key, value):
         cache = self.cache
         if key not in cache:
             cache[key] = []
-        cache[key].append(value)
-        epoch = len(cache[key]) - 1
-        value = self.value2str(value)
-        if not self.mute:
+        values = cache[key]
+        values.append(value)
+        if self._log is not None:
+            if isinstance(values, Series) and values.policy != "all":
+                self._stale.add(key)  # only the stats, at each sync
+                self._tick()
+            else:
+                self._append(key, value)
+        epoch = (values.total if isinstance(values, Series) else len(values)) - 1
+        if not self.mute and self._may_print():
+            value = self.value2str(value)
             print(f"COLLECTOR Epoch {epoch:03d} : {key}={value}")
 
+    def _may_print(self):
+        if not self._print_rate:
+            return True
+        second = int(time.time())
+        start, n = self._printed
+        if second != start:
+            start, n = second, 0
+        self._printed = (start, n + 1)
+        if n < self._print_rate:
+            return True
+        self._suppressed += 1
+        return False
+
+    def series(self, key, policy="all", size=10000, dtype="float64"):
+        """
+        Keep the numeric values of key in a Series (numpy backed) instead of a list.
+        @ policy : all, window, stride, reservoir or stats, see Series
+        @ size : max values kept by the bounded policies
+        save writes the kept values, and the exact count/min/max/mean/last of all
+        values under key + "_stats". A stream only logs the stats of a bounded
+        policy, at each sync, so the log of a long run stays small.
+        """
+        self.flush()
+        with self._lock:
+            s = Series(policy, size, dtype)
+            for v in self.cache.get(key, []):
+                s.append(v)
+            self.cache[key] = s
+        return s
+
+    def _to_json(self):
+        out = {}
+        for k, v in self.cache.items():
+            if isinstance(v, Series):
+                out[k] = v.tolist()
+                out[f"{k}_stats"] = [v.stats()]
+            else:
+                out[k] = v
+        return out
+
+    def buffered(self, flush_interval=1.0, print_rate=20):
+        """
+        Make add only enqueue the value; a background thread moves tensors to cpu
+        in batches, records, streams and prints them every flush_interval seconds.
+        @ print_rate : max lines printed per second, 0 for no limit
+        Reading a key, flush() and save() see every value added before.
+        """
+        if self._queue is not None:
+            return
+        self._queue = deque()
+        self._print_rate = print_rate
+        self._stop = threading.Event()
+
+        def loop():
+            while not self._stop.wait(flush_interval):
+                self.flush()
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def unbuffered(self):
+        if self._queue is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._queue = None
+        self._print_rate = 0
+
+    def flush(self):
+        """record every value enqueued by add in buffered mode"""
+        if self._queue is None:
+            return
+        with self._lock:
+            items = []
+            while self._queue:
+                items.append(self._queue.popleft())
+            for key, value in tensors_to_py(items):
+                self._record(key, value)
+            if self._suppressed:
+                print(f"COLLECTOR suppressed {self._suppressed} lines")
+                self._suppressed = 0
+
+    def stream(self, path, sync_interval=10.0, buffering=1 << 16):
+        """
+        @ path : the final collector file, values are appended to log_path(path)
+        @ sync_interval : seconds between flush+fsync of the log
+        Every later add is appended to the log, so a crashed or preempted run
+        keeps its metrics. save(path) compacts the log into path. The log of an
+        earlier attempt in the same folder is moved to log_path(path) + ".1".
+        """
+        self.close_stream()
+        self._log_path = log_path(path)
+        if os.path.exists(self._log_path):
+            os.replace(self._log_path, self._log_path + ".1")
+        self._log = open(self._log_path, "w", buffering=buffering)
+        self._sync_interval = sync_interval
+        self._last_sync = time.time()
+        # replay what was added before streaming started
+        for key, values in self.cache.items():
+            if isinstance(values, Series) and values.policy != "all":
+                self._stale.add(key)
+                continue
+            for value in values:
+                self._append(key, value)
+
+    def _append(self, key, value):
+        self._log.write(json.dumps([key, value]) + "\n")
+        self._tick()
+
+    def _tick(self):
+        now = time.time()
+        if now - self._last_sync >= self._sync_interval:
+            self.sync()
+            self._last_sync = now
+
+    def sync(self):
+        if self._log is not None:
+            for key in self._stale:
+                values = self.cache.get(key)
+                if isinstance(values, Series):  # unless cleared since
+                    record = [f"{key}_stats", values.stats(), "set"]
+                    self._log.write(json.dumps(record) + "\n")
+            self._stale.clear()
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def close_stream(self):
+        self.flush()
+        if self._log is not None:
+            self.sync()
+            self._log.close()
+            self._log = None
+
     def save(self, path):
-        json.dump(self.cache, open(path, "w"))
+        self.flush()
+        if self.tracer is not None and self.tracer.stats:
+            self.cache["timing"] = [self.tracer.summary()]
+            self.tracer.save_trace(os.path.join(os.path.dirname(path), "trace.json"))
+        streamed = self._log_path if self._log is not None else None
+        self.close_stream()
+        from . import colfile
 
-    def load(self, path):
-        self.cache = json.load(open(path))
+        tmp = path + ".tmp"
+        if path.endswith(colfile.EXT):
+            colfile.save_binary(tmp, self.cache)
+        else:
+            with open(tmp, "w") as f:
+                f.write(json.dumps(self._to_json()))  # json.dump writes in small chunks
+        # the collector file doubles as the finish flag, so never expose half of it
+        os.replace(tmp, path)
+        if streamed == log_path(path) and os.path.exists(streamed):
+            os.remove(streamed)
+            self._log_path = None
+
+    def load(self, path, compact=False, keys=None, mmap=False):
+        """
+        load path, or rebuild from its append log if the run never saved.
+        A .lwc file (see colfile) is read in place of a missing json path.
+        @ compact : write the rebuilt cache to path and drop the log
+        @ keys : only load these keys, reading nothing else of a .lwc file
+        @ mmap : numeric keys of a .lwc file as numpy memmaps
+        """
+        from . import colfile
+
+        path = colfile.resolve(path)
+        if os.path.exists(path) and colfile.is_binary(path):
+            self.cache = colfile.load_binary(path, keys, mmap)
+            return
+        if os.path.exists(path) or not os.path.exists(log_path(path)):
+            cache = json.load(open(path))
+            if keys is not None:
+                cache = {k: cache[k] for k in keys if k in cache}
+            self.cache = cache
+            return
+        self.cache = read_log(log_path(path))
+        if compact:
+            self.save(path)
+            os.remove(log_path(path))
 
     def clear(self):
-        self.cache = {}
+        with self._lock:  # a flush of the background thread would re-add values
+            self.flush()
+            self.cache = {}
+
+    def reset(self):
+        """back to a fresh collector, e.g. between the jobs of a warm worker"""
+        self.unbuffered()  # joins the flush thread, so not under the lock
+        with self._lock:
+            self.close_stream()
+            self._log_path = None
+            self.cache = {}
+            self.init_time = time.time()
+            self.mute = False
+            self._printed = (0, 0)
+            self._suppressed = 0
+        if self.tracer is not None:
+            self.tracer.clear()
 
     def add_GPU_MEM(self, device, id = True):
         if id:
             device = f"cuda:{device}"
+        import torch
+
         t = torch.cuda.get_device_properties(device).total_memory
         r = torch.cuda.memory_reserved(device)
         a = torch.cuda.memory_allocated(device)
@@ -49,19 +336,37 @@ class Collector:
         self.add("GPU_MEM_reserved_MB", r / (1024**2))
         self.add("GPU_MEM_allocated_MB", a / (1024**2))
 
-    def add_graph_data(self, dataset):
-        self.add("#graphs", len(dataset))
-        self.add("avg_nodes", np.mean([d.x.shape[0] for d in dataset]))
-        self.add("avg_edges", np.mean([d.edge_index.shape[1] for d in dataset]))
-        self.add("feat_dim", dataset[0].x.shape[1])
+    def add_graph_data(self, dataset, max_graphs=100000):
+        """
+        add #graphs, feat_dim and the avg/std/min/max/p50/p90/p99 of the nodes
+        and edges per graph, read from the collated slices when dataset has them,
+        see graphstats.py
+        """
+        from .graphstats import graph_stats, PERCENTILES
+
+        stats = graph_stats(dataset, max_graphs)
+        self.add("#graphs", stats["graphs"])
+        if stats["sampled"]:
+            self.add("#graphs_sampled", stats["sampled"])
+        for k in ("nodes", "edges"):
+            s = stats[k]
+            if "mean" not in s:
+                continue
+            self.add(f"avg_{k}", s["mean"])
+            for name in ["std", "min", "max"] + [f"p{p}" for p in PERCENTILES]:
+                self.add(f"{name}_{k}", s[name])
+        self.add("feat_dim", stats["feat_dim"])
 
     def add_node_data(self, dataset):
+        import torch
+
         self.add("nodes", dataset.x.shape[0])
         self.add("edges", dataset.edge_index.shape[1])
         self.add("feat_dim", dataset.x.shape[1])
         self.add("num_classes", torch.max(dataset.y).item() + 1)
 
     def get_single(self):
+        self.flush()
         d = {}
         for k, v in self.cache.items():
             if len(v) == 0:
@@ -69,6 +374,7 @@ class Collector:
         return d
 
     def get_seq(self):
+        self.flush()
         d = {}
         for k, v in self.cache.items():
             if len(v) > 1:
@@ -79,4 +385,5 @@ class Collector:
         self.add("all_time", time.time() - self.init_time)
 
 
-COLLECTOR = Collector()
+COLLECTOR = Collector(tracer=TRACER)
+atexit.register(COLLECTOR.close_stream)
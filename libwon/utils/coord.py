@@ -0,0 +1,214 @@
+import asyncio
+import os
+import socket
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from .resource import SlotPool
+
+
+class Coordinator:
+    """
+    Serve a config list to worker agents on other nodes.
+    A claim hands out each config to exactly one worker; the configs claimed by a
+    worker whose connection drops are put back for the others.
+    @ configs : list of params
+    @ address : (host, port) to listen on
+    @ authkey : shared secret of coordinator and workers, e.g. from authkey_file
+    @ on_report : f(idx, cfg, code), called when a worker reports a config, so
+        that the coordinator alone writes the shared index
+    """
+
+    def __init__(self, configs, address=("localhost", 6100), authkey=None, on_report=None):
+        if not authkey:
+            raise ValueError("Coordinator needs an authkey, see auth.authkey_file")
+        self.configs = list(configs)
+        self.address = tuple(address)
+        self.authkey = authkey
+        self.on_report = on_report
+        self.pending = deque(range(len(self.configs)))
+        self.claimed = {}  # idx -> worker
+        self.codes = {}  # idx -> exit code
+        self.cond = threading.Condition()
+        self.listener = None
+
+    def finished(self):
+        return len(self.codes) == len(self.configs)
+
+    def claim(self, worker):
+        with self.cond:
+            if self.pending:
+                idx = self.pending.popleft()
+                self.claimed[idx] = worker
+                print(f"Coordinator : worker {worker} claims {idx} {self.configs[idx]}")
+                return ("cfg", idx, self.configs[idx])
+            if self.finished():
+                return ("done",)
+            return ("wait",)
+
+    def report(self, worker, idx, code):
+        with self.cond:
+            mine = self.claimed.get(idx) == worker
+            if mine:
+                del self.claimed[idx]
+                print(f"Coordinator : worker {worker} finish {idx} code {code}")
+        if mine and self.on_report is not None:
+            try:
+                self.on_report(idx, self.configs[idx], code)
+            except Exception as e:
+                print(f"Coordinator : report of {idx} failed {e!r}")
+        with self.cond:
+            if mine:  # finished only once on_report is done
+                self.codes[idx] = code
+            self.cond.notify_all()
+        return ("ok",)
+
+    def release_worker(self, worker):
+        with self.cond:
+            lost = [idx for idx, w in self.claimed.items() if w == worker]
+            for idx in lost:
+                del self.claimed[idx]
+            self.pending.extendleft(sorted(lost, reverse=True))
+            if lost:
+                print(f"Coordinator : worker {worker} lost, requeue {lost}")
+            self.cond.notify_all()
+
+    def _handle(self, conn):
+        worker = None
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == "hello":
+                    worker = msg[1]
+                    reply = ("ok",)
+                elif msg[0] == "claim":
+                    reply = self.claim(worker)
+                elif msg[0] == "report":
+                    reply = self.report(worker, msg[1], msg[2])
+                else:
+                    reply = ("error", f"unknown message {msg[0]}")
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            if worker is not None:
+                self.release_worker(worker)
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:  # listener closed
+                return
+            except Exception as e:  # failed handshake
+                print(f"Coordinator : reject connection {e!r}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+        print(f"Coordinator : serving {len(self.configs)} configs on {self.address}")
+        return self
+
+    def wait(self):
+        """block until every config has been reported, @ return : {idx: code}"""
+        with self.cond:
+            self.cond.wait_for(self.finished)
+        self.listener.close()
+        return self.codes
+
+    def serve(self):
+        return self.start().wait()
+
+
+def work(address, resources, func, authkey, name=None, poll=5.0):
+    """
+    Worker agent: claim configs from a Coordinator while local slots are free.
+    Exit codes are reported to the coordinator, which updates the shared index.
+    @ address : (host, port) of the coordinator
+    @ resources : local gpu devices, as in mp_exec
+    @ func : f(dev,cfg), the same func given to mp_exec
+    @ return : {idx: exit code} of the configs run here
+    """
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    conn = Client(tuple(address), authkey=authkey)
+    conn.send(("hello", name))
+    conn.recv()
+
+    def request(*msg):
+        conn.send(msg)
+        return conn.recv()
+
+    try:
+        return asyncio.run(_work(request, resources, func, poll))
+    finally:
+        conn.close()
+
+
+async def _work(request, resources, func, poll):
+    loop = asyncio.get_running_loop()
+    pool = resources if hasattr(resources, "acquire") else SlotPool(list(resources))
+    executor = ThreadPoolExecutor(max_workers=max(1, len(pool)))
+    net = ThreadPoolExecutor(max_workers=1)  # one request at a time on the socket
+
+    async def ask(*msg):
+        return await loop.run_in_executor(net, request, *msg)
+
+    codes = {}
+    running = set()
+
+    async def job(idx, dev, cfg):
+        try:
+            res = await loop.run_in_executor(executor, func, dev, cfg)
+            if hasattr(res, "run_async"):  # a Command or a WarmCommand
+                res = await res.run_async(executor)
+        except Exception as e:
+            print(f"Device {dev} Error cfg {cfg} : {e!r}")
+            res = -1
+        codes[idx] = res
+        print(f"Device {dev} Finish cfg {cfg} ")
+        try:
+            await ask("report", idx, res)
+        except (EOFError, OSError):
+            print(f"Worker : cannot report cfg {cfg}")
+        return dev
+
+    finished = False
+    try:
+        while not (finished and not running):
+            waiting = False
+            while not finished and not pool.full():
+                reply = await ask("claim")
+                if reply[0] == "done":
+                    finished = True
+                elif reply[0] == "wait":
+                    waiting = True
+                    break
+                else:
+                    _, idx, cfg = reply
+                    dev = pool.acquire()
+                    print(f"Start config {cfg} on device {dev}")
+                    running.add(asyncio.ensure_future(job(idx, dev, cfg)))
+            if not running:
+                if not finished:
+                    await asyncio.sleep(poll)
+                continue
+            done, running = await asyncio.wait(
+                running,
+                timeout=poll if waiting else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for t in done:
+                pool.release(t.result())
+    except (EOFError, OSError):
+        print("Worker : coordinator gone")  # it exits once every config is reported
+        if running:
+            await asyncio.wait(running)
+    finally:
+        executor.shutdown(wait=False)
+        net.shutdown(wait=False)
+    return codes
@@ -0,0 +1,210 @@
+"""
+Size statistics of graph datasets for Collector.add_graph_data, computed from
+the collated storage when there is one:
+    InMemoryDataset  offsets of slices["x"] and slices["edge_index"], restricted
+                     to _indices for a subset
+    Batch            ptr offsets, and the batch vector for the edges
+Other datasets are iterated, on a uniform sample of max_graphs graphs when they
+are larger, and unsized iterables are streamed through reservoir Series.
+"""
+import hashlib
+import json
+import os
+from .series import Series
+
+PERCENTILES = (50, 90, 99)
+_CACHE = {}
+
+
+def _numpy(t):
+    import numpy as np
+
+    if hasattr(t, "detach"):
+        return t.detach().cpu().numpy()
+    return np.asarray(t)
+
+
+def _data(dataset):
+    """collated Data of an InMemoryDataset"""
+    data = getattr(dataset, "_data", None)
+    return getattr(dataset, "data", None) if data is None else data
+
+
+def _feat_dim(x):
+    if x is None:
+        return None
+    return int(x.shape[1]) if len(x.shape) > 1 else 1
+
+
+def _from_slices(dataset):
+    """@ return : (nodes, edges, feat_dim) of every graph, None without slices"""
+    import numpy as np
+
+    slices = getattr(dataset, "slices", None)
+    if not isinstance(slices, dict) or "x" not in slices or "edge_index" not in slices:
+        return None
+    nodes = np.diff(_numpy(slices["x"]))
+    edges = np.diff(_numpy(slices["edge_index"]))
+    idx = getattr(dataset, "_indices", None)
+    if idx is not None:  # a subset view shares the slices of its parent
+        idx = _numpy(idx) if hasattr(idx, "detach") else np.asarray(idx)
+        nodes, edges = nodes[idx], edges[idx]
+    return nodes, edges, _feat_dim(getattr(_data(dataset), "x", None))
+
+
+def _from_batch(dataset):
+    """@ return : (nodes, edges, feat_dim) of every graph, None if no Batch"""
+    import numpy as np
+
+    ptr = getattr(dataset, "ptr", None)
+    batch = getattr(dataset, "batch", None)
+    edge_index = getattr(dataset, "edge_index", None)
+    if ptr is None or batch is None or edge_index is None:
+        return None
+    nodes = np.diff(_numpy(ptr))
+    edges = np.bincount(_numpy(batch)[_numpy(edge_index[0])], minlength=len(nodes))
+    return nodes, edges, _feat_dim(getattr(dataset, "x", None))
+
+
+def _sizes(d):
+    return d.x.shape[0], d.edge_index.shape[1]
+
+
+def _summary(values, **exact):
+    """count, min, max, mean, std and percentiles of values, exact ones override"""
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    s = dict(count=len(values))
+    if len(values):
+        s.update(
+            min=float(values.min()),
+            max=float(values.max()),
+            mean=float(values.mean()),
+            std=float(values.std()),
+        )
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            s[f"p{p}"] = float(v)
+    s.update(exact)
+    return s
+
+
+def fingerprint(dataset, max_graphs):
+    """
+    @ return : key of the statistics of dataset, from the stat of its processed
+        files or the bytes of its slices, None if it has neither
+    """
+    h = hashlib.sha1(f"{type(dataset).__qualname__} {max_graphs}".encode())
+    if hasattr(dataset, "__len__"):
+        h.update(str(len(dataset)).encode())
+    stable = False
+    for path in getattr(dataset, "processed_paths", None) or []:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        h.update(f"{os.path.abspath(path)} {st.st_size} {st.st_mtime_ns}".encode())
+        stable = True
+    slices = getattr(dataset, "slices", None)
+    if not stable and isinstance(slices, dict):
+        for k in ("x", "edge_index"):
+            if k in slices:
+                h.update(_numpy(slices[k]).tobytes())
+                stable = True
+    idx = getattr(dataset, "_indices", None)
+    if stable and idx is not None:
+        h.update(_numpy(idx).astype("int64").tobytes())
+    return h.hexdigest()[:16] if stable else None
+
+
+def _compute(dataset, max_graphs, seed):
+    import numpy as np
+
+    for source, f in (("slices", _from_slices), ("batch", _from_batch)):
+        res = f(dataset)
+        if res is not None:
+            nodes, edges, feat_dim = res
+            return dict(
+                source=source,
+                graphs=len(nodes),
+                sampled=0,
+                feat_dim=feat_dim,
+                nodes=_summary(nodes),
+                edges=_summary(edges),
+            )
+    sized = hasattr(dataset, "__len__") and hasattr(dataset, "__getitem__")
+    if sized:
+        n = len(dataset)
+        if n > max_graphs:  # a uniform sample, every graph costs a python object
+            rng = np.random.default_rng(seed)
+            idx = np.sort(rng.choice(n, max_graphs, replace=False))
+            sizes = np.array([_sizes(dataset[int(i)]) for i in idx]).reshape(-1, 2)
+            source, sampled = "sample", max_graphs
+        else:
+            sizes = np.array([_sizes(d) for d in dataset]).reshape(-1, 2)
+            source, sampled = "index", 0
+        feat_dim = _feat_dim(dataset[0].x) if n else None
+        return dict(
+            source=source,
+            graphs=n,
+            sampled=sampled,
+            feat_dim=feat_dim,
+            nodes=_summary(sizes[:, 0], count=n),
+            edges=_summary(sizes[:, 1], count=n),
+        )
+    # stream, exact count/min/max/mean and percentiles of a reservoir sample
+    series = [Series("reservoir", max_graphs, seed=seed) for _ in range(2)]
+    feat_dim = None
+    for d in dataset:
+        if feat_dim is None:
+            feat_dim = _feat_dim(d.x)
+        for s, v in zip(series, _sizes(d)):
+            s.append(v)
+    nodes, edges = (
+        _summary(s.values(), **{k: v for k, v in s.stats().items() if k != "last"})
+        for s in series
+    )
+    total = series[0].total
+    return dict(
+        source="stream",
+        graphs=total,
+        sampled=len(series[0]) if total > max_graphs else 0,
+        feat_dim=feat_dim,
+        nodes=nodes,
+        edges=edges,
+    )
+
+
+def graph_stats(dataset, max_graphs=100000, seed=0, cache_dir=None):
+    """
+    @ max_graphs : graphs read one by one at most, beyond it the distributions
+        are estimated on a uniform sample; collated storage reads every graph
+    @ cache_dir : where to keep the statistics by fingerprint, processed_dir of
+        the dataset by default; they are also cached in memory
+    @ return : dict(source, graphs, sampled, feat_dim, nodes=summary,
+        edges=summary), a summary has count, min, max, mean, std, p50, p90, p99
+    """
+    key = fingerprint(dataset, max_graphs)
+    if key is not None and key in _CACHE:
+        return _CACHE[key]
+    path = None
+    if key is not None:
+        cache_dir = cache_dir or getattr(dataset, "processed_dir", None)
+        if cache_dir is not None and os.path.isdir(cache_dir):
+            path = os.path.join(cache_dir, f"graph_stats_{key}.json")
+            try:
+                _CACHE[key] = json.load(open(path))
+                return _CACHE[key]
+            except (OSError, ValueError):
+                pass
+    stats = _compute(dataset, max_graphs, seed)
+    if key is not None:
+        _CACHE[key] = stats
+    if path is not None:
+        try:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            json.dump(stats, open(tmp, "w"), indent=1)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return stats
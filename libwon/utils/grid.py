@@ -0,0 +1,125 @@
+import bisect
+import itertools
+import math
+
+
+def _hkey(v):
+    """hashable identity of a config value, 1 and 1.0 and True stay distinct"""
+    try:
+        hash(v)
+        return (type(v).__name__, v)
+    except TypeError:
+        return (type(v).__name__, repr(v))
+
+
+class Grid:
+    """
+    Lazy view of the configs of a grid dict or a list of grid dicts, in the order
+    of ParallelerGrid.get_configs without building them.
+    grid[i] decodes the i-th config of the concatenated products in O(#keys)
+    (mixed radix, the last key varying fastest). Repeated values of a key are
+    dropped; a config is a duplicate if an earlier grid dict already yields it,
+    see is_dup / unique / count_unique.
+    """
+
+    def __init__(self, grid_list):
+        grids = grid_list if isinstance(grid_list, list) else [grid_list]
+        self.keys = []
+        self.values = []
+        self.sets = []
+        for g in grids:
+            keys = list(g.keys())
+            values = []
+            for k in keys:
+                seen = {}
+                for v in g[k]:
+                    seen.setdefault(_hkey(v), v)
+                values.append(list(seen.values()))
+            self.keys.append(keys)
+            self.values.append(values)
+            self.sets.append(
+                {k: {_hkey(v) for v in vs} for k, vs in zip(keys, values)}
+            )
+        self.sizes = [math.prod(len(vs) for vs in values) for values in self.values]
+        self.offsets = list(itertools.accumulate([0] + self.sizes))
+        # earlier grids with the same keys are the only ones that can repeat a config
+        self.earlier = [
+            [i for i in range(j) if set(self.keys[i]) == set(self.keys[j])]
+            for j in range(len(self.keys))
+        ]
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def _locate(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("grid index out of range")
+        j = bisect.bisect_right(self.offsets, i) - 1
+        return j, i - self.offsets[j]
+
+    def _decode(self, j, r):
+        digits = []
+        for vs in reversed(self.values[j]):
+            r, d = divmod(r, len(vs))
+            digits.append(vs[d])
+        return dict(zip(self.keys[j], reversed(digits)))
+
+    def __getitem__(self, i):
+        return self._decode(*self._locate(i))
+
+    def _grid_iter(self, j):
+        for values in itertools.product(*self.values[j]):
+            yield dict(zip(self.keys[j], values))
+
+    def __iter__(self):
+        for j in range(len(self.keys)):
+            yield from self._grid_iter(j)
+
+    def _in(self, i, cfg):
+        s = self.sets[i]
+        return all(_hkey(v) in s[k] for k, v in cfg.items())
+
+    def _dup(self, j, cfg):
+        return any(self._in(i, cfg) for i in self.earlier[j])
+
+    def is_dup(self, i):
+        j, r = self._locate(i)
+        return self._dup(j, self._decode(j, r))
+
+    def unique(self, rank=0, world=1):
+        """
+        stream the configs without duplicates
+        @ rank, world : only yield raw indices i with i % world == rank, so that
+            several launchers split the grid without talking to each other
+        """
+        i = 0
+        for j in range(len(self.keys)):
+            for cfg in self._grid_iter(j):
+                if i % world == rank and not self._dup(j, cfg):
+                    yield cfg
+                i += 1
+
+    def shard(self, rank, world):
+        return self.unique(rank, world)
+
+    def count_unique(self):
+        """number of configs without duplicates, by inclusion-exclusion on the boxes"""
+        total = 0
+        for j in range(len(self.keys)):
+            earlier = self.earlier[j]
+            if len(earlier) > 16:
+                total += sum(1 for cfg in self._grid_iter(j) if not self._dup(j, cfg))
+                continue
+            for n in range(len(earlier) + 1):
+                for sub in itertools.combinations(earlier, n):
+                    inter = 1
+                    for k in self.keys[j]:
+                        s = self.sets[j][k]
+                        for i in sub:
+                            s = s & self.sets[i][k]
+                        inter *= len(s)
+                    total += (-1) ** n * inter
+        return total
+
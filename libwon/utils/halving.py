@@ -0,0 +1,188 @@
+import json
+import os
+import re
+from .misc import EarlyStopping, update_json
+
+LINE = re.compile(r"^COLLECTOR Epoch (\d+) : (.+?)=(.*)$")
+
+
+class MetricReader:
+    """
+    Incrementally read the values a running job adds to its collector, from the
+    streamed collector.jsonl as soon as the job opens it, else from the
+    metrics.jsonl the launcher parses from its output.
+    """
+
+    def __init__(
+        self,
+        log_dir,
+        stream_name="collector.jsonl",
+        metrics_name="metrics.jsonl",
+    ):
+        self.paths = [
+            os.path.join(log_dir, stream_name),
+            os.path.join(log_dir, metrics_name),
+        ]
+        self.offset = 0
+        self.inode = None
+        self.source = None
+        self.values = {}
+
+    def _restart(self, source):
+        self.source, self.offset, self.inode, self.values = source, 0, None, {}
+
+    def _lines(self):
+        # checked at every poll, the job opens its stream after the launcher
+        # creates metrics.jsonl, and the stream is complete (nothing rate-limited)
+        if self.source != self.paths[0] and os.path.exists(self.paths[0]):
+            self._restart(self.paths[0])
+        elif self.source is None:
+            if not os.path.exists(self.paths[1]):
+                return []
+            self._restart(self.paths[1])
+        try:
+            with open(self.source, "rb") as f:
+                st = os.fstat(f.fileno())
+                if self.inode != st.st_ino or st.st_size < self.offset:
+                    self._restart(self.source)  # a new attempt rewrote the file
+                    self.inode = st.st_ino
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:  # the stream is compacted once the job saves
+            return []
+        end = data.rfind(b"\n") + 1  # keep a partial last line for the next read
+        self.offset += end
+        return data[:end].decode(errors="replace").splitlines()
+
+    def update(self):
+        for line in self._lines():
+            try:
+                key, value = json.loads(line)
+            except ValueError:
+                continue
+            self.values.setdefault(key, []).append(value)
+        return self.values
+
+    def __getitem__(self, key):
+        return self.update().get(key, [])
+
+
+class SuccessiveHalving:
+    """
+    Asynchronous successive halving across the configs of a sweep.
+    When a running config reaches a rung (number of values of metric), it is
+    compared with every config that reached the same rung before: it is stopped
+    unless it is within the best 1/eta of them. Comparison follows EarlyStopping,
+    a config is stopped if the cut-off value is_better than its own.
+    @ metric : collector key of the validation metric, added once per epoch
+    @ rungs : increasing numbers of epochs at which configs are compared
+    @ eta : keep the best 1/eta at each rung
+    @ min_rung_size : configs needed at a rung before stopping anyone
+    @ state_path : json file keeping the rung records across launches
+    """
+
+    def __init__(
+        self,
+        metric,
+        rungs,
+        mode="max",
+        min_delta=0,
+        percentage=False,
+        eta=3,
+        min_rung_size=None,
+        state_path=None,
+    ):
+        self.metric = metric
+        self.rungs = sorted(rungs)
+        self.mode = mode
+        self.eta = eta
+        self.min_rung_size = min_rung_size or eta
+        self.state_path = state_path
+        self.es = EarlyStopping(metric, mode, min_delta, 1, percentage)
+        self.records = {str(r): {} for r in self.rungs}  # rung -> {folder: value}
+        if state_path is not None and os.path.exists(state_path):
+            self.records.update(json.load(open(state_path)))
+
+    def _best(self, values):
+        return max(values) if self.mode == "max" else min(values)
+
+    def judge(self, name, values):
+        """
+        @ name : unique name of the config, e.g. its folder
+        @ values : metric values so far, non-numeric ones (e.g. the repr of a
+            tensor parsed from the output) are skipped
+        @ return : None to continue, else (rung, value, cut-off) of the stop
+        """
+        values = [
+            v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)
+        ]
+        for r in self.rungs:
+            if len(values) < r:
+                break
+            if name in self.records[str(r)]:
+                continue
+            value = self._best(values[:r])
+            self._save(str(r), name, value)
+            records = self.records[str(r)]
+            if len(records) < self.min_rung_size:
+                continue
+            ranked = sorted(records.values(), reverse=self.mode == "max")
+            cut = ranked[max(1, len(ranked) // self.eta) - 1]
+            if self.es.is_better(cut, value):
+                return r, value, cut
+        return None
+
+    def _save(self, rung, name, value):
+        """record value, merged with the records of other launchers of the sweep"""
+        if self.state_path is None:
+            self.records[rung][name] = value
+            return
+
+        def merge(records):
+            for r, recs in self.records.items():
+                disk = records.setdefault(r, {})
+                for k, v in recs.items():
+                    disk.setdefault(k, v)
+            records[rung][name] = value
+            return records
+
+        self.records = update_json(self.state_path, merge)
+
+
+class HalvingMonitor:
+    """
+    mp_exec monitor stopping the running configs that SuccessiveHalving rejects,
+    a pruned.json marker keeps them from being run again.
+    @ log_dir_of : f(cfg) -> run folder
+    @ interval : seconds between polls
+    """
+
+    def __init__(self, halving, log_dir_of, interval=10.0, marker="pruned.json"):
+        self.halving = halving
+        self.log_dir_of = log_dir_of
+        self.interval = interval
+        self.marker = marker
+        self.readers = {}
+
+    def poll(self, running):
+        """@ running : {idx: cfg}, @ return : idxs to stop"""
+        stop = []
+        readers = {}
+        for idx, cfg in running.items():
+            log_dir = self.log_dir_of(cfg)
+            reader = self.readers.get(log_dir) or MetricReader(log_dir)
+            readers[log_dir] = reader
+            res = self.halving.judge(
+                os.path.basename(log_dir), reader[self.halving.metric]
+            )
+            if res is None:
+                continue
+            rung, value, cut = res
+            print(f"Halving : stop cfg {cfg} at rung {rung}, {value} vs cut-off {cut}")
+            json.dump(
+                dict(rung=rung, value=value, cut=cut),
+                open(os.path.join(log_dir, self.marker), "w"),
+            )
+            stop.append(idx)
+        self.readers = readers
+        return stop
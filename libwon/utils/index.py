@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from . import colfile
+from .misc import count_dir_size
+
+DONE, RUNNING, UNFINISH, PRUNED = "done", "running", "unfinish", "pruned"
+PRUNE_FLAG = "pruned.json"  # written by HalvingMonitor in the run folder
+
+
+def summarize(cache):
+    """last numeric value of every key, enough for status and scheduling queries"""
+    summary = {}
+    for k, v in cache.items():
+        if v and isinstance(v[-1], (int, float)) and not isinstance(v[-1], bool):
+            summary[k] = v[-1]
+    return summary
+
+
+def scan_run(log_dir, finish_file, run_flag="cmd.txt", prune_flag=PRUNE_FLAG):
+    """
+    @ log_dir : the run folder under exp_dir
+    @ return : row dict of status, mtime, all_time, size, metrics
+    """
+    row = dict(status=UNFINISH, mtime=0.0, all_time=None, size=0, metrics={})
+    try:
+        row["mtime"] = os.stat(log_dir).st_mtime
+        names = set(os.listdir(log_dir))
+    except FileNotFoundError:
+        return row
+    if finish_file in names or colfile.binary_path(finish_file) in names:
+        row["status"] = DONE
+        try:
+            row["metrics"] = colfile.read_summary(os.path.join(log_dir, finish_file))
+            row["all_time"] = row["metrics"].get("all_time")
+        except Exception as e:
+            print(f"Index : cannot read {log_dir} {e}")
+    elif prune_flag in names:
+        row["status"] = PRUNED
+    elif run_flag in names:
+        row["status"] = RUNNING
+    row["size"] = count_dir_size(log_dir)
+    return row
+
+
+class ExpIndex:
+    """
+    Persistent index of the runs of a ParallelerGrid, stored as sqlite in log_dir.
+    A run is rescanned when its folder mtime changes (a running one at every
+    refresh), so status queries only stat exp_dir. Every write bumps the
+    generation of the index, the parsed rows are cached until it changes.
+    """
+
+    COLUMNS = ["folder", "status", "mtime", "all_time", "size", "metrics", "updated"]
+    SCANNED = ["status", "mtime", "all_time", "size", "metrics"]
+
+    def __init__(self, path, exp_dir, finish_file="collector.json", timeout=60):
+        self.path = path
+        self.exp_dir = exp_dir
+        self.finish_file = finish_file
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = None  # (generation, {folder: row})
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"], state["_lock"]
+        state["_cache"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        # sqlite connections must not cross a fork or a thread
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=self.timeout)
+            local.pid = os.getpid()
+            local.conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs (folder TEXT PRIMARY KEY, status TEXT,"
+                " mtime REAL, all_time REAL, size INTEGER, metrics TEXT, updated REAL)"
+            )
+            local.conn.execute("CREATE TABLE IF NOT EXISTS meta (generation INTEGER)")
+            local.conn.execute(
+                "INSERT INTO meta SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM meta)"
+            )
+            local.conn.commit()
+        return local.conn
+
+    def generation(self):
+        """counter of the writes to the index, by any process"""
+        return self.conn.execute("SELECT generation FROM meta").fetchone()[0]
+
+    def _to_row(self, values):
+        row = dict(zip(self.COLUMNS, values))
+        row["metrics"] = json.loads(row["metrics"]) if row["metrics"] else {}
+        return row
+
+    def rows(self, folders=None):
+        """@ return : {folder: row}, the rows are shared with the cache, read only"""
+        generation = self.generation()
+        with self._lock:
+            if self._cache is None or self._cache[0] != generation:
+                cur = self.conn.execute(f"SELECT {','.join(self.COLUMNS)} FROM runs")
+                self._cache = (generation, {r[0]: self._to_row(r) for r in cur})
+            rows = self._cache[1]
+        if folders is None:
+            return dict(rows)
+        return {f: rows[f] for f in folders if f in rows}
+
+    def _write(self, items):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO runs VALUES (?,?,?,?,?,?,?)",
+                [
+                    (
+                        f,
+                        r["status"],
+                        r["mtime"],
+                        r["all_time"],
+                        r["size"],
+                        json.dumps(r["metrics"]),
+                        now,
+                    )
+                    for f, r in items
+                ],
+            )
+            generation = self.generation()
+            self.conn.execute("UPDATE meta SET generation = ?", (generation + 1,))
+        with self._lock:  # the cache is current if nobody else wrote in between
+            if self._cache is not None and self._cache[0] == generation:
+                rows = self._cache[1]
+                for f, r in items:
+                    rows[f] = dict(r, folder=f, updated=now)
+                self._cache = (generation + 1, rows)
+            else:
+                self._cache = None
+
+    def update(self, folder):
+        """rescan one run, called by the launcher when the job exits"""
+        row = scan_run(os.path.join(self.exp_dir, folder), self.finish_file)
+        self._write([(folder, row)])
+        row["folder"] = folder
+        return row
+
+    def refresh(self, folders, full=False):
+        """
+        @ folders : run folders to report
+        @ full : rescan every run, whatever its folder mtime
+        @ return : {folder: row}
+        """
+        rows = self.rows()
+        changed = []
+        for folder in folders:
+            row = rows.get(folder)
+            log_dir = os.path.join(self.exp_dir, folder)
+            if row is not None and not full:
+                try:
+                    mtime = os.stat(log_dir).st_mtime
+                except FileNotFoundError:
+                    mtime = 0.0
+                if row["mtime"] == mtime and row["status"] != RUNNING:
+                    continue
+            new = scan_run(log_dir, self.finish_file)
+            new["folder"] = folder
+            if row is not None and all(row[k] == new[k] for k in self.SCANNED):
+                continue  # e.g. a running job that wrote nothing new
+            rows[folder] = new
+            changed.append((folder, new))
+        if changed:
+            self._write(changed)
+        return {f: rows[f] for f in folders if f in rows}
+
+    def total_size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()[0]
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import threading
+import time
+from .misc import update_json
+
+
+def canonical_config(cfg):
+    """json of cfg with sorted keys, 1, 1.0 and True stay distinct"""
+    return json.dumps(cfg, sort_keys=True, separators=(",", ":"), default=repr)
+
+
+def config_key(cfg, code_digest, length=16):
+    """folder name of cfg run with the code of code_digest"""
+    data = canonical_config(cfg) + "\n" + (code_digest or "")
+    return hashlib.sha1(data.encode()).hexdigest()[:length]
+
+
+class LayoutIndex:
+    """
+    Human-readable index of a content-addressed exp dir: layout.json maps each
+    folder to its config, the digest of the code it ran and when it was created.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            self.entries = json.load(open(path))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def register(self, items):
+        """
+        @ items : [(folder, cfg, code_digest)], folders already known are kept;
+            merged with the entries other launchers wrote meanwhile
+        """
+        with self.lock:
+            new = [x for x in items if x[0] not in self.entries]
+            if not new:
+                return
+            now = time.time()
+
+            def merge(entries):
+                for folder, cfg, code in new:
+                    entries.setdefault(
+                        folder, dict(config=cfg, code=code, created=now)
+                    )
+                return entries
+
+            self.entries = update_json(self.path, merge, indent=1, default=repr)
+
+    def folders(self, cfg):
+        """folders of cfg across code versions, oldest first"""
+        c = canonical_config(cfg)
+        found = [
+            (e["created"], f)
+            for f, e in self.entries.items()
+            if canonical_config(e["config"]) == c
+        ]
+        return [f for _, f in sorted(found)]
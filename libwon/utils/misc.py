@@ -1,12 +1,12 @@
 import random
-import numpy as np
-import torch
+import sys
 import os
 import os.path as osp
 import math
 import shutil
 from functools import wraps
 from time import time
+from .trace import TRACER
 
 def setup_seed(seed: int):
     r"""Sets the seed for generating random numbers in PyTorch, numpy and
@@ -15,6 +15,9 @@ def setup_seed(seed: int):
     Args:
         seed (int): The desired seed.
     """
+    import numpy as np
+    import torch
+
     random.seed(seed)
     os.environ["PYTHONHASHSEED"] = str(seed)
     np.random.seed(seed)
@@ -53,12 +56,19 @@ def convert_time(size_bytes):
 
 
 def count_dir_size(dir):
+    """bytes of the files under dir, hard links counted once"""
     total_size = 0
+    seen = set()
     for dirpath, dirnames, filenames in os.walk(dir):
         for f in filenames:
             fp = os.path.join(dirpath, f)
             if not os.path.islink(fp):
-                total_size += os.path.getsize(fp)
+                st = os.stat(fp)
+                if st.st_nlink > 1:
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                total_size += st.st_size
     return total_size
 
 
@@ -85,10 +95,13 @@ def cp_pys(src_dir, tar_dir, filt=default_filt):
     )
 
 def timing(f):
+    """print the wall time of each call, also recorded as a TRACER span"""
+
     @wraps(f)
     def wrap(*args, **kw):
         ts = time()
-        result = f(*args, **kw)
+        with TRACER.span(f.__name__):
+            result = f(*args, **kw)
         te = time()
         print(f"Timing : Func {f.__name__} took: {convert_time(te-ts)}")
         return result
@@ -96,7 +109,44 @@ def timing(f):
     return wrap
 
 
-def move_to(obj, device):
+def update_json(path, update, **dump_kwargs):
+    """
+    read-modify-write the json file path under an exclusive lock of path.lock,
+    so that concurrent launchers merge their changes instead of overwriting
+    @ update : f(data) -> new data, data is {} if path does not exist
+    @ return : the new data
+    """
+    import fcntl
+    import json
+
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        data = update(data)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp, path)
+    return data
+
+
+def move_to(obj, device, batched=False, non_blocking=True):
+    """
+    move the tensors of a nested dict/list/tuple batch to device
+    @ batched : pack the tensors of each dtype into one staging buffer (pinned
+        when moving to cuda) and move it with a single copy, the moved tensors
+        are views of it; for batches of many small tensors
+    @ non_blocking : only applies to copies from pinned cpu memory to cuda, any
+        other copy (e.g. cuda to cpu) blocks so the result is ready when returned
+    """
+    if batched:
+        leaves = []
+        _leaves(obj, leaves)
+        return _rebuild(obj, iter(_move_leaves(leaves, device, non_blocking)))
     if isinstance(obj, dict):
         res = {}
         for k, v in obj.items():
@@ -114,6 +164,146 @@ def move_to(obj, device):
     return obj
 
 
+def _leaves(obj, out):
+    if isinstance(obj, dict):
+        for v in obj.values():
+            _leaves(v, out)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            _leaves(v, out)
+    elif hasattr(obj, "to"):
+        out.append(obj)
+
+
+def _rebuild(obj, moved):
+    if isinstance(obj, dict):
+        return {k: _rebuild(v, moved) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_rebuild(v, moved) for v in obj]
+    elif isinstance(obj, tuple):
+        return tuple(_rebuild(v, moved) for v in obj)
+    if hasattr(obj, "to"):
+        return next(moved)
+    return obj
+
+
+def pack_tensors(tensors, pin=False):
+    """
+    copy tensors into one flat buffer per (device, dtype)
+    @ return : {(device, dtype): buffer}, [(key, offset, shape)] per tensor
+    """
+    import torch
+
+    groups, sizes, layout = {}, {}, []
+    for t in tensors:
+        key = (t.device, t.dtype)
+        offset = sizes.get(key, 0)
+        layout.append((key, offset, t.shape))
+        groups.setdefault(key, []).append(t)
+        sizes[key] = offset + t.numel()
+    buffers = {}
+    for key, ts in groups.items():
+        buf = torch.empty(
+            sizes[key], dtype=key[1], device=key[0], pin_memory=pin and key[0].type == "cpu"
+        )
+        torch.cat([t.reshape(-1) for t in ts], out=buf)
+        buffers[key] = buf
+    return buffers, layout
+
+
+def unpack_tensors(buffers, layout):
+    """views of the buffers of pack_tensors (possibly moved) shaped as the tensors"""
+    return [
+        buffers[key][offset : offset + math.prod(shape)].view(shape)
+        for key, offset, shape in layout
+    ]
+
+
+def _async_copy(src, device, pinned):
+    """a non_blocking copy is only safe from pinned cpu memory to cuda"""
+    return src.type == "cpu" and device.type == "cuda" and pinned
+
+
+def _move_leaves(leaves, device, non_blocking=True):
+    import torch
+
+    device = torch.device(device)
+    res = list(leaves)
+    idxs = []
+    for i, t in enumerate(leaves):
+        if not torch.is_tensor(t):
+            res[i] = t.to(device)  # e.g. graphs, they move themselves
+        elif t.device.type == device.type and device.index in (None, t.device.index):
+            continue
+        elif t.layout != torch.strided or t.requires_grad:
+            nb = non_blocking and _async_copy(t.device, device, t.is_pinned())
+            res[i] = t.to(device, non_blocking=nb)
+        else:
+            idxs.append(i)
+    if not idxs:
+        return res
+    buffers, layout = pack_tensors(
+        [leaves[i] for i in idxs], pin=device.type == "cuda" and torch.cuda.is_available()
+    )
+    buffers = {
+        k: buf.to(
+            device,
+            non_blocking=non_blocking and _async_copy(k[0], device, buf.is_pinned()),
+        )
+        for k, buf in buffers.items()
+    }
+    for i, t in zip(idxs, unpack_tensors(buffers, layout)):
+        res[i] = t
+    return res
+
+
+class Prefetcher:
+    """
+    iterate a loader with the batches moved to device by move_to(batched=True),
+    on cuda the copy of the next batch runs on a side stream during the compute
+    on the current one
+    """
+
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = device
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        import torch
+
+        device = torch.device(self.device)
+        if device.type != "cuda":
+            for batch in self.loader:
+                yield move_to(batch, device, batched=True)
+            return
+        stream = torch.cuda.Stream(device)
+
+        def load(it):
+            try:
+                batch = next(it)
+            except StopIteration:
+                return None
+            with torch.cuda.stream(stream):
+                return (move_to(batch, device, batched=True),)
+
+        it = iter(self.loader)
+        nxt = load(it)
+        while nxt is not None:
+            torch.cuda.current_stream(device).wait_stream(stream)
+            batch = nxt[0]
+            leaves = []
+            _leaves(batch, leaves)
+            for t in leaves:
+                if torch.is_tensor(t) and t.device.type == "cuda":
+                    # memory of the side stream is in use on the compute stream
+                    t.record_stream(torch.cuda.current_stream(device))
+            nxt = load(it)
+            yield batch
+
+
 class EarlyStopping:
     """EarlyStopping class to keep NN from overfitting. copied from nni
     if mode=='min' : lower the better
@@ -142,12 +332,11 @@ class EarlyStopping:
         @params metrics: metric value
         @return : True if stop
         """
-
         if self.best is None:
             self.best = metrics
             return False
 
-        if np.isnan(metrics):
+        if math.isnan(metrics):
             return True
 
         if self.is_better(metrics, self.best):
@@ -194,14 +383,78 @@ class EarlyStopping:
 
 
 
+class BatchedEarlyStopping:
+    """EarlyStopping of n metric streams stepped together, state kept in numpy arrays.
+    Each stream behaves exactly as EarlyStopping.step_one of its own.
+    mode, min_delta and percentage may be given per stream.
+    property best, num_bad_epochs and best_epoch are arrays of shape (n,)
+    """
+
+    def __init__(self, n, mode="max", min_delta=0, patience=10, percentage=False):
+        import numpy as np
+
+        modes = np.broadcast_to(np.asarray(mode), (n,))
+        if not np.isin(modes, ["min", "max"]).all():
+            raise ValueError(f"mode {mode} is unknown!")
+        self.n = n
+        self.patience = patience
+        self.is_max = modes == "max"
+        self.min_delta = np.broadcast_to(np.asarray(min_delta, dtype=float), (n,))
+        self.percentage = np.broadcast_to(np.asarray(percentage, dtype=bool), (n,))
+        self.reset()
+
+    def reset(self):
+        import numpy as np
+
+        self.best = np.full(self.n, np.nan)
+        self.started = np.zeros(self.n, dtype=bool)
+        self.num_bad_epochs = np.zeros(self.n, dtype=np.int64)
+        self.best_epoch = np.full(self.n, -1, dtype=np.int64)
+        self.epoch = 0
+
+    def is_better(self, a, best):
+        import numpy as np
+
+        if self.patience == 0:  # as EarlyStopping, every value is better
+            return np.ones(np.broadcast(a, best).shape, dtype=bool)
+        margin = np.where(self.percentage, best * self.min_delta / 100, self.min_delta)
+        return np.where(self.is_max, a > best + margin, a < best - margin)
+
+    def step(self, values):
+        """
+        @params values: array of shape (n,), one metric value per stream
+        @return : bool array, True for the streams to stop
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        first = ~self.started
+        nan = np.isnan(values)
+        active = self.started & ~nan
+        improve = active & self.is_better(values, self.best)
+        self.num_bad_epochs = np.where(
+            improve, 0, self.num_bad_epochs + active.astype(np.int64)
+        )
+        new_best = improve | first
+        self.best = np.where(new_best, values, self.best)
+        self.best_epoch = np.where(new_best, self.epoch, self.best_epoch)
+        self.started = np.ones(self.n, dtype=bool)
+        self.epoch += 1
+        return ~first & (nan | (self.num_bad_epochs >= self.patience))
+
+
 
 def get_arg_dict(args):
     info_dict = args.__dict__
     ks = list(info_dict.keys())
     arg_dict = {}
+    types = [int, float, str, bool]
+    # a value can only be a tensor if torch was imported by the caller
+    if "torch" in sys.modules:
+        types.append(sys.modules["torch"].Tensor)
     for k in ks:
         v = info_dict[k]
-        for t in [int, float, str, bool, torch.Tensor]:
+        for t in types:
             if isinstance(v, t):
                 arg_dict[k] = v
                 break
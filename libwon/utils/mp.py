@@ -1,9 +1,12 @@
-import torch.multiprocessing as mp
-from queue import Queue
-import time
+import asyncio
 import random
-import os
-import numpy as np
+import shlex
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .resource import SlotPool
+
 
 def dummy_func(dev, cfg):
     time.sleep(random.random() * 2)
@@ -12,40 +15,291 @@ def dummy_func(dev, cfg):
 def dummy_config():
     return list(range(20))
 
-def mp_exec(resources, configs, func):
+
+class Command:
     """
-    @ resources : list of gpu devices
+    A job for mp_exec, launched directly without a shell.
+    @ args : argv list
+    @ stdout : file path the output is redirected to, None to inherit
+    @ on_exit : f(returncode), called from a worker thread once the job exits
+    @ capture : OutputCapture that stdout and stderr are read into instead
+    """
+
+    def __init__(
+        self, args, stdout=None, cwd=None, env=None, on_exit=None, capture=None
+    ):
+        self.args = [str(a) for a in args]
+        self.stdout = stdout
+        self.capture = capture
+        self.cwd = cwd
+        self.env = env
+        self.on_exit = on_exit
+        self.proc = None
+        self.started = None  # time.time() of the spawn and of the exit
+        self.exited = None
+
+    def __str__(self):
+        cmd = shlex.join(self.args)
+        if self.capture is not None:
+            cmd += f' > "{self.capture.path}" 2>&1'
+        elif self.stdout:
+            cmd += f' > "{self.stdout}"'
+        return cmd
+
+    def _open_stdout(self):
+        return open(self.stdout, "wb") if self.stdout else None
+
+    def run(self):
+        """run in the foreground and return the exit code"""
+        if self.capture is not None:
+            proc = subprocess.Popen(
+                self.args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.cwd,
+                env=self.env,
+            )
+            self.capture.open()
+            try:
+                for data in iter(lambda: proc.stdout.read1(1 << 16), b""):
+                    self.capture.feed(data)
+            finally:
+                self.capture.close()
+            code = proc.wait()
+            if self.on_exit is not None:
+                self.on_exit(code)
+            return code
+        out = self._open_stdout()
+        try:
+            code = subprocess.run(
+                self.args, stdout=out, cwd=self.cwd, env=self.env
+            ).returncode
+        finally:
+            if out is not None:
+                out.close()
+        if self.on_exit is not None:
+            self.on_exit(code)
+        return code
+
+    async def run_async(self, executor=None):
+        capture = self.capture
+        out = subprocess.PIPE if capture is not None else self._open_stdout()
+        try:
+            self.proc = await asyncio.create_subprocess_exec(
+                *self.args,
+                stdout=out,
+                stderr=subprocess.STDOUT if capture is not None else None,
+                cwd=self.cwd,
+                env=self.env,
+            )
+            self.started = time.time()
+        finally:
+            if out is not None and capture is None:
+                out.close()  # the child holds its own descriptor
+        if capture is not None:
+            capture.open()
+            try:
+                while True:
+                    data = await self.proc.stdout.read(1 << 16)
+                    if not data:
+                        break
+                    capture.feed(data)
+            finally:
+                capture.close()
+        code = await self.proc.wait()
+        self.exited = time.time()
+        if self.on_exit is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self.on_exit, code
+            )
+        return code
+
+    def terminate(self):
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.terminate()
+
+
+def _slots(pool):
+    """{dev: slots} of a pool for Telemetry, one per device when unknown"""
+    if isinstance(pool, SlotPool):
+        slots = {}
+        for dev in pool.free:
+            slots[str(dev)] = slots.get(str(dev), 0) + 1
+        return slots
+    devices = getattr(pool, "devices", None)
+    if devices is None:
+        return None
+    return {str(d): getattr(pool, "max_jobs", None) or 1 for d in devices}
+
+
+async def _schedule(
+    resources,
+    configs,
+    func,
+    cost=None,
+    retry=None,
+    retry_wait=0,
+    lookahead=64,
+    monitor=None,
+    telemetry=None,
+):
+    """
+    Dispatch configs onto free resources from a single event loop.
+    func runs in a thread (it is expected to only build a Command); Commands
+    are awaited as child processes, so a slot costs no thread or process
+    (WarmCommands hand the job to a warm worker instead).
+    @ resources : devices (any iterable), or a pool with acquire/release (see resource.py),
+        a pool with a poll attribute is asked again every poll seconds
+    @ cost : f(cfg), the capacity a config takes from a pool
+    @ retry : f(cfg), True to put the cfg back in the queue after it exits
+    @ retry_wait : max seconds a retried slot stays idle, to spread collisions
+    @ lookahead : pending configs tried when the head one does not fit
+    @ monitor : object with interval and poll({idx: cfg} of running Commands)
+        returning the idxs to terminate, e.g. HalvingMonitor
+    @ telemetry : Telemetry recording the timeline of every job
+    """
+    loop = asyncio.get_running_loop()
+    # a pool has acquire/release, any other iterable is a list of devices
+    pool = resources if hasattr(resources, "acquire") else SlotPool(list(resources))
+    poll = getattr(pool, "poll", None)
+    executor = ThreadPoolExecutor(max_workers=max(1, len(pool)))
+    pending = deque(enumerate(configs))
+    results = [None] * len(pending)
+    enqueued = dict.fromkeys(range(len(pending)), time.time())
+    if telemetry is not None:
+        telemetry.start(_slots(pool))
+    running = set()
+    commands = {}
+    stopped = set()  # idxs terminated by the monitor
+
+    async def job(idx, dev, cfg, c, dispatched):
+        started = time.time()
+        exited = None
+        try:
+            res = await loop.run_in_executor(executor, func, dev, cfg)
+            if hasattr(res, "run_async"):  # a Command or a WarmCommand
+                commands[idx] = (cfg, res)
+                cmd = res
+                res = await cmd.run_async(executor)
+                started, exited = cmd.started, cmd.exited
+        except Exception as e:
+            print(f"Device {dev} Error cfg {cfg} : {e!r}")
+            res = e
+        commands.pop(idx, None)
+        pruned = idx in stopped
+        stopped.discard(idx)
+        if telemetry is not None:
+            code = repr(res) if isinstance(res, Exception) else res
+            if pruned:  # terminated on purpose, not a failure
+                code = "pruned"
+            telemetry.job(
+                cfg,
+                dev,
+                enqueued[idx],
+                dispatched,
+                started or dispatched,
+                exited or time.time(),
+                code if isinstance(code, (int, str, type(None))) else None,
+            )
+        results[idx] = res
+        print(f"Device {dev} Finish cfg {cfg} ")
+        print(res)
+        again = False
+        if retry is not None:
+            try:
+                again = await loop.run_in_executor(executor, retry, cfg)
+            except Exception as e:  # e.g. the run folder is unreadable, a failed job
+                print(f"Device {dev} Error checking cfg {cfg} : {e!r}")
+                results[idx] = e
+        if again:
+            print(f"Undone cfg {cfg} ")
+            enqueued[idx] = time.time()
+            pending.append((idx, cfg))
+            # dev collsion, so wait to put current dev
+            await asyncio.sleep(int(random.random() * retry_wait))
+        return dev, c
+
+    def dispatch():
+        skipped = []
+        while pending and not pool.full() and len(skipped) < lookahead:
+            idx, cfg = pending.popleft()
+            c = cost(cfg) if cost is not None else None
+            dev = pool.acquire(c)
+            if dev is None:
+                skipped.append((idx, cfg))
+                if c is None:  # nothing else would fit either
+                    break
+                continue
+            print(f"Start config {cfg} on device {dev}")
+            running.add(asyncio.ensure_future(job(idx, dev, cfg, c, time.time())))
+        pending.extendleft(reversed(skipped))
+
+    async def watch():
+        while True:
+            await asyncio.sleep(monitor.interval)
+            current = {idx: cfg for idx, (cfg, _) in commands.items()}
+            try:
+                stop = await loop.run_in_executor(executor, monitor.poll, current)
+            except Exception as e:  # one bad poll must not end the monitoring
+                print(f"Monitor error : {e!r}")
+                continue
+            for idx in stop:
+                if idx in commands:
+                    stopped.add(idx)
+                    commands[idx][1].terminate()
+
+    watcher = asyncio.ensure_future(watch()) if monitor is not None else None
+    try:
+        while pending or running:
+            dispatch()
+            if not running:
+                if poll is None:
+                    raise RuntimeError(f"no resource can take config {pending[0][1]}")
+                await asyncio.sleep(poll)
+                continue
+            done, running = await asyncio.wait(
+                running, timeout=poll, return_when=asyncio.FIRST_COMPLETED
+            )
+            for t in done:
+                pool.release(*t.result())
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        executor.shutdown(wait=False)
+    return results
+
+
+def mp_exec(resources, configs, func, cost=None, monitor=None, telemetry=None):
+    """
+    @ resources : list of gpu devices, repeat a device to run several jobs on it,
+        or a CapacityPool to pack jobs by cost, or an ArbiterPool to lease devices
+        from a node-local Arbiter shared with other sweeps
     @ configs : list of params
-    @ func : f(dev,cfg)
+    @ func : f(dev,cfg), either runs the job or returns a Command to launch
+    @ cost : f(cfg), capacity a config needs, e.g. MemoryCost
+    @ monitor : stops running Commands it rejects, e.g. HalvingMonitor
+    @ telemetry : Telemetry recording when each job was enqueued, dispatched,
+        started and exited, see telemetry.report
+    @ return : list of results in config order, exit codes for Commands
     """
-    q = Queue()
-    for res in resources:
-        q.put(res)
-    pool = mp.Pool()
-
-    def put_back_dev(dev, cfg):
-        def callback(*args):
-            print(f"Device {dev} Finish cfg {cfg} ")
-            q.put(dev)
-            print(*args)
-
-        return callback
-
-    for idx, cfg in enumerate(configs):
-        dev = q.get()
-        print(f"Start config {cfg} on device {dev}")
-        pool.apply_async(
-            func,
-            args=[dev, cfg],
-            callback=put_back_dev(dev, cfg),
-            error_callback=put_back_dev(dev, cfg),
+    return asyncio.run(
+        _schedule(
+            resources, configs, func, cost=cost, monitor=monitor, telemetry=telemetry
         )
+    )
 
-    pool.close()
-    pool.join()
 
-
-def mp_exec_trial(resources, configs, func, check_done, remove_run_flag, trial_time):
+def mp_exec_trial(
+    resources,
+    configs,
+    func,
+    check_done,
+    remove_run_flag,
+    trial_time,
+    cost=None,
+    monitor=None,
+    telemetry=None,
+):
     """
     @ resources : list of gpu devices
     @ configs : list of params
@@ -53,42 +307,22 @@ def mp_exec_trial(resources, configs, func, check_done, remove_run_flag, trial_t
     @ check_done : f(cfg)
     @ remove_run_flag : f(cfg)
     """
-    q = Queue()
-    for res in resources:
-        q.put(res)
-
-    qcfg = Queue()
-    for cfg in configs:
-        qcfg.put(cfg)
-
-    pool = mp.Pool()
-
-    def put_back_dev(dev, cfg):
-        def callback(*args):
-            print(f"Device {dev} Finish cfg {cfg} ")
-            if not check_done(cfg):
-                remove_run_flag(cfg)
-                print(f"Undone cfg {cfg} ")
-                qcfg.put(cfg)
-                sleeptime = int((random.random()) * trial_time)
-                time.sleep(sleeptime)  # dev collsion, so wait to put current dev
-            q.put(dev)
-            print(*args)
-
-        return callback
-
-    while not qcfg.empty():
-        cfg = qcfg.get()
-        dev = q.get()
-        print(f"Start config {cfg} on device {dev}")
-        pool.apply_async(
-            func,
-            args=[dev, cfg],
-            callback=put_back_dev(dev, cfg),
-            error_callback=put_back_dev(dev, cfg),
-        )
-
-    pool.close()
-    pool.join()
 
+    def retry(cfg):
+        if check_done(cfg):
+            return False
+        remove_run_flag(cfg)
+        return True
 
+    return asyncio.run(
+        _schedule(
+            resources,
+            configs,
+            func,
+            cost=cost,
+            retry=retry,
+            retry_wait=trial_time,
+            monitor=monitor,
+            telemetry=telemetry,
+        )
+    )
@@ -1,8 +1,35 @@
+import json
 import os
-from .mp import mp_exec, mp_exec_trial
-from .collector import COLLECTOR
-from .cloud import send_autodl
-from .misc import *
+import shlex
+import shutil
+import statistics
+import sys
+import threading
+import time
+from .mp import Command, mp_exec, mp_exec_trial
+from .cloud import make_notifier
+from .coord import Coordinator, work
+from .auth import authkey_file
+from .arbiter import KEY_FILE, ArbiterPool
+from .index import ExpIndex, DONE, RUNNING, PRUNED, PRUNE_FLAG
+from .halving import HalvingMonitor, SuccessiveHalving
+from .resource import (
+    CapacityModel,
+    CapacityPool,
+    CudaCapacity,
+    FixedCapacity,
+    MemoryCost,
+)
+from .grid import Grid
+from .predict import RuntimeModel, simulate
+from .telemetry import Telemetry, report
+from .capture import OutputCapture, read_progress
+from .warm import WarmCommand, WarmWorkers
+from .layout import LayoutIndex, config_key
+from . import colfile
+from .snapshot import SnapshotStore
+from .results import Results
+from .misc import convert_size, convert_time, count_dir_size
 class ParallelerGrid:
     def __init__(
         self,
@@ -20,7 +47,55 @@ class ParallelerGrid:
         epoch_arg="p_epoch",
         trial=False,
         trial_time=30,
+        capacity=None,
+        mem_default=float("inf"),
+        coordinator=("localhost", 6100),
+        coord_authkey=None,
+        arbiter=None,
+        priority=1,
+        arbiter_key_file=None,
+        arbiter_shared=False,
+        shard=(0, 1),
+        adaptive=None,
+        capture=None,
+        warm=None,
+        layout="name",
     ):
+        """
+        @ capacity : None to run one job per entry of gpus, else pack jobs by their
+            recorded GPU memory: "cuda" to read the device memory, a {gpu: MB} dict
+            or a CapacityModel
+        @ mem_default : MB of configs never run before, inf runs them alone
+        @ coordinator : (host, port) of "-t serve", "-t work" agents on each node
+            claim configs from it; serve listens on that host only
+        @ coord_authkey : secret of the coordinator and its agents, by default a
+            random key created in log_dir/coord.key (mode 0600)
+        @ arbiter : (host, port) of a node-local Arbiter to lease gpus from instead
+            of owning gpus, priority is the weight of this sweep in its fair share
+        @ arbiter_key_file : key file of the arbiter, ~/.libwon/arbiter.key by
+            default, arbiter_shared for a 0640 key shared by the group of the file
+        @ shard : (rank, world), this launcher only runs its share of the grid, also
+            set by "-s rank/world"
+        @ adaptive : kwargs of SuccessiveHalving, e.g. dict(metric="val_acc",
+            mode="max", rungs=[5, 15, 45], eta=3), to stop running configs whose
+            metric falls behind at a rung
+        @ capture : kwargs of OutputCapture, e.g. dict(max_bytes=16 << 20, backups=2),
+            the output of each job is gzipped into log_out.txt.gz with rotation
+        @ warm : True, or kwargs of WarmWorkers plus an optional entry, to run the
+            configs in long-lived workers (one per running slot) instead of a new
+            interpreter each; the entry is the script of cmd by default, or a
+            "module:function" reading sys.argv
+        @ phone_notice : dict(token=..., title=..., name=..., content=...) of the
+            autodl push sent when run or serve ends, from a background thread;
+            events adds "fail" (each failed job), "job" (each job) and
+            "milestone" (every quarter of the jobs) to the default ["done"],
+            a transport object with send(title, name, content) replaces autodl
+            and the other keys are kwargs of Notifier (coalesce, retries, ...)
+        @ layout : "name" names run folders by joining the config values, "hash" by
+            a hash of the canonical config and of the code snapshot, so that run
+            only skips configs whose config and code are both unchanged;
+            layout.json in log_dir maps the folders to their configs
+        """
         self.resources = gpus
         self.grid_list = grid_list
         self.log_dir = log_dir
@@ -32,9 +107,36 @@ class ParallelerGrid:
         self.readme = readme
         self.finish_file = finish_file
         self.phone_notice = phone_notice
+        self.notifier = make_notifier(phone_notice)
+        self.notice_events = set((phone_notice or {}).get("events", ["done"]))
+        self.notice_events.add("done")
+        self._jobs = [0, 0, 0]  # planned, exited, failed
+        self._jobs_lock = threading.Lock()
         self.epoch_arg = epoch_arg
         self.trial = trial
         self.trial_time = trial_time
+        self.capacity = capacity
+        self.mem_default = mem_default
+        self.coordinator = coordinator
+        self.coord_authkey = coord_authkey
+        self.remote = False  # a work agent, the coordinator writes the index
+        self.arbiter = arbiter
+        self.priority = priority
+        self.arbiter_key_file = arbiter_key_file
+        self.arbiter_shared = arbiter_shared
+        self.shard = tuple(shard)
+        self.adaptive = adaptive
+        self.capture = capture or {}
+        self.warm = {} if warm is True else warm
+        if layout not in ("name", "hash"):
+            raise ValueError(f"layout {layout} is unknown!")
+        self.layout = layout
+        self._code_digest = None
+        self._runtime_fit = None  # (index generation and folders, RuntimeModel)
+        self.workers = None
+        if self.warm is not None:
+            opts = {k: v for k, v in self.warm.items() if k != "entry"}
+            self.workers = WarmWorkers(**opts)
 
         self.exp_dir = os.path.join(log_dir, "exp")
         self.ana_dir = os.path.join(log_dir, "ana")
@@ -45,6 +147,12 @@ class ParallelerGrid:
         os.makedirs(self.scr_dir, exist_ok=True)
 
         open(os.path.join(self.log_dir, "readme.md"), "w").write(self.readme)
+        self.index = ExpIndex(
+            os.path.join(log_dir, "index.db"), self.exp_dir, finish_file
+        )
+        self.telemetry_path = os.path.join(self.ana_dir, "telemetry.jsonl")
+        self.snapshots = SnapshotStore(self.scr_dir)
+        self.layout_index = LayoutIndex(os.path.join(log_dir, "layout.json"))
 
     @staticmethod
     def collect_keys(grid_list):
@@ -58,45 +166,53 @@ class ParallelerGrid:
         else:
             assert False
 
+    @property
+    def grid(self):
+        """lazy Grid of grid_list, see grid.py"""
+        return Grid(self.grid_list)
+
+    def iter_configs(self):
+        """stream the configs of this launcher, without duplicates"""
+        rank, world = self.shard
+        return self.grid.unique(rank, world)
+
     def get_configs(self):
-        grid_list = self.grid_list
-
-        def gen_config_one(grid_list):
-            configs = []
-            config = {}
-            param_names = list(grid_list.keys())
-
-            def gen_config(ni, config, configs):
-                if ni >= len(param_names):
-                    configs.append(config.copy())
-                    return
-                pname = param_names[ni]
-                plist = grid_list[pname]
-                for i, p in enumerate(plist):
-                    config[pname] = p
-                    gen_config(ni + 1, config, configs)
-                    del config[pname]
-
-            gen_config(0, config, configs)
-            return configs
-
-        configs = []
-        if isinstance(grid_list, list):
-            for g in grid_list:
-                configs.extend(gen_config_one(g))
-        else:
-            configs.extend(gen_config_one(grid_list))
-        return configs
+        return list(self.iter_configs())
 
     def cfg2dirname(self, cfg):
+        if self.layout == "hash":
+            return config_key(cfg, self.code_digest())
         folder = "_".join(list(map(str, cfg.values())))
         return folder
 
+    def code_digest(self):
+        """
+        digest of the script dirs, without the launcher script so that editing the
+        grid does not invalidate the runs
+        """
+        if self._code_digest is None:
+            launcher = getattr(sys.modules["__main__"], "__file__", None)
+            self._code_digest = self.snapshots.digest(
+                [self.exp_script_dir, self.base_script_dir],
+                exclude=[launcher] if launcher else [],
+            )
+        return self._code_digest
+
+    def register_layout(self, configs):
+        if self.layout == "hash":
+            digest = self.code_digest()
+            self.layout_index.register(
+                [(self.cfg2dirname(cfg), cfg, digest) for cfg in configs]
+            )
+
     def check_done(self, cfg):
+        """finished, or pruned by the halving monitor, so never retried"""
         folder = self.cfg2dirname(cfg)
         log_dir = os.path.join(self.exp_dir, folder)
         done = os.path.join(log_dir, self.finish_file)
-        return os.path.exists(done)
+        return os.path.exists(colfile.resolve(done)) or os.path.exists(
+            os.path.join(log_dir, PRUNE_FLAG)
+        )
 
     def remove_run_flag(self, cfg):
         folder = self.cfg2dirname(cfg)
@@ -106,34 +222,39 @@ class ParallelerGrid:
             os.remove(cmd)
 
     def get_run_time(self, configs):
-        times = []
-        for cfg in configs:
-            folder = self.cfg2dirname(cfg)
-            try:
-                COLLECTOR.load(os.path.join(self.exp_dir, folder, "collector.json"))
-                time = COLLECTOR.cache["all_time"][0]
-                times.append(float(time))
-            except:
-                pass
-        return times
-
-    def check_finish(self, detail=False):
-        configs = self.get_configs()
+        rows = self.index.refresh([self.cfg2dirname(cfg) for cfg in configs])
+        return [
+            float(r["all_time"]) for r in rows.values() if r["all_time"] is not None
+        ]
+
+    def check_finish(self, detail=False, full=False, configs=None, slots=None):
+        """@ slots : jobs running at once for the time predictions, see slot_count"""
+        if configs is None:
+            configs = self.get_configs()
+        if slots is None:
+            slots = self.slot_count(configs=configs)
+        folders = [self.cfg2dirname(cfg) for cfg in configs]
+        rows = self.index.refresh(folders, full=full)
         finish = []
         unfinish = []
         running = []
-        for idx, cfg in enumerate(configs):
-            folder = self.cfg2dirname(cfg)
-            log_dir = os.path.join(self.exp_dir, folder)
-            cmd = os.path.join(log_dir, "cmd.txt")
-            done = os.path.join(log_dir, self.finish_file)
-            if os.path.exists(done):
+        times = []
+        pruned = 0
+        for idx, (cfg, folder) in enumerate(zip(configs, folders)):
+            status = rows[folder]["status"]
+            if status == PRUNED:
                 finish.append([idx, cfg])
+                pruned += 1
+            elif status == DONE:
+                finish.append([idx, cfg])
+                if rows[folder]["all_time"] is not None:
+                    times.append(float(rows[folder]["all_time"]))
+            elif status == RUNNING:
+                running.append([idx, cfg])
             else:
-                if not os.path.exists(cmd):
-                    unfinish.append([idx, cfg])
-                else:
-                    running.append([idx, cfg])
+                unfinish.append([idx, cfg])
+        self.runtime_model = self.fit_runtime(configs, rows, folders)
+        eta, makespan = self.predict_finish(running, unfinish, slots)
         if detail:
             print("#" * 30, "Finish", "#" * 30)
             for idx, cfg in finish:
@@ -141,32 +262,100 @@ class ParallelerGrid:
 
             print("#" * 30, "UnFinish", "#" * 30)
             for idx, cfg in unfinish:
-                print(idx, cfg)
+                print(idx, cfg, f"ETA={eta.get(idx, 'NaN')}")
 
             print("#" * 30, "Running", "#" * 30)
             for idx, cfg in running:
-                print(idx, cfg)
-        times = self.get_run_time(configs)
-        time_avg = convert_time(np.mean(times)) if len(times) else "NaN"
+                progress = read_progress(os.path.join(self.exp_dir, folders[idx]))
+                epoch = progress and progress["epoch"]
+                print(
+                    idx,
+                    cfg,
+                    f"Epoch={'NaN' if epoch is None else epoch}",
+                    f"ETA={eta.get(idx, 'NaN')}",
+                )
+        time_avg = convert_time(statistics.mean(times)) if len(times) else "NaN"
         time_till_now = (
-            convert_time(sum(times) / len(self.resources)) if len(times) else "NaN"
-        )
-        time_to_go = (
-            convert_time(
-                (np.mean(times) * (len(unfinish) + len(running))) / len(self.resources)
-            )
-            if len(times)
-            else "NaN"
+            convert_time(sum(times) / slots) if len(times) else "NaN"
         )
+        time_to_go = convert_time(makespan) if makespan is not None else "NaN"
         print(
-            f"# Total={len(configs)} # Finish={len(finish)} , # Unfinish={len(unfinish)} , # Running={len(running)}, # TotalTime={time_till_now}, # AvgTime={time_avg}, # TimeToGo={time_to_go}"
+            f"# Total={len(configs)} # Finish={len(finish)} , # Pruned={pruned} , # Unfinish={len(unfinish)} , # Running={len(running)}, # TotalTime={time_till_now}, # AvgTime={time_avg}, # TimeToGo={time_to_go}"
         )
         for dir in [self.ana_dir, self.exp_dir, self.scr_dir]:
-            print(
-                f"DIR {os.path.abspath(dir)} Using {convert_size(count_dir_size(dir))}"
+            size = (
+                self.index.total_size() if dir == self.exp_dir else count_dir_size(dir)
             )
+            print(f"DIR {os.path.abspath(dir)} Using {convert_size(size)}")
         return finish, unfinish
 
+    def fit_runtime(self, configs, rows, folders=None):
+        """
+        RuntimeModel fitted on the all_time of the finished configs, refit only
+        when the index changed since the last fit on the same folders
+        """
+        if folders is None:
+            folders = [self.cfg2dirname(cfg) for cfg in configs]
+        key = (self.index.generation(), tuple(folders))
+        if self._runtime_fit is not None and self._runtime_fit[0] == key:
+            return self._runtime_fit[1]
+        done = [
+            (cfg, rows[f]["all_time"])
+            for cfg, f in zip(configs, folders)
+            if f in rows and rows[f]["all_time"] is not None
+        ]
+        model = RuntimeModel().fit([c for c, _ in done], [t for _, t in done])
+        self._runtime_fit = (key, model)
+        return model
+
+    def slot_count(self, pool=None, cost=None, configs=()):
+        """
+        Jobs running at once on the pool of get_pool: its slots, or for a
+        CapacityPool the configs of mean cost fitting on each device.
+        @ pool, cost : from get_pool, None to build them unless that needs the
+            arbiter or the gpus, then one job per entry of gpus is assumed
+        """
+        if pool is None:
+            if self.arbiter is not None or self.capacity == "cuda":
+                return max(len(self.resources), 1)
+            pool, cost = self.get_pool(configs)
+        if not isinstance(pool, CapacityPool):
+            return max(len(pool), 1)
+        costs = [cost(cfg) for cfg in configs] if cost is not None else []
+        costs = [c for c in costs if c and c != float("inf")]
+        mean = sum(costs) / len(costs) if costs else None
+        slots = 0
+        for dev in pool.devices:
+            n = max(int(pool.caps[dev] // mean), 1) if mean else 1
+            slots += min(n, pool.max_jobs or n)
+        return max(slots, 1)
+
+    def predict_finish(self, running, unfinish, slots):
+        """
+        Replay the dispatch of unfinish (longest first) after the running jobs.
+        @ slots : jobs running at once, see slot_count
+        @ return : {idx: predicted finish as a time string}, makespan seconds
+        """
+        model = self.runtime_model
+        if not model.fitted:
+            return {}, None
+        now = time.time()
+        remaining = []
+        for idx, cfg in running:
+            cmd = os.path.join(self.exp_dir, self.cfg2dirname(cfg), "cmd.txt")
+            try:
+                elapsed = now - os.stat(cmd).st_mtime
+            except FileNotFoundError:
+                elapsed = 0
+            remaining.append(max(model.predict(cfg) - elapsed, 0.0))
+        order = sorted(unfinish, key=lambda x: -model.predict(x[1]))
+        finish, makespan = simulate(
+            slots, remaining, [model.predict(cfg) for _, cfg in order]
+        )
+        eta = {idx: convert_time(t) for (idx, _), t in zip(running, remaining)}
+        eta.update({idx: convert_time(t) for (idx, _), t in zip(order, finish)})
+        return eta, makespan
+
     def execute(self, cp=True):
         from argparse import ArgumentParser
 
@@ -176,10 +365,21 @@ class ParallelerGrid:
                 "-t",
                 type=str,
                 default="show",
-                choices=["show", "run", "debug", "clear", "check"],
+                choices=[
+                    "show",
+                    "run",
+                    "debug",
+                    "clear",
+                    "check",
+                    "index",
+                    "serve",
+                    "work",
+                    "report",
+                ],
             )
             parser.add_argument("-c", type=int, default=0)
             parser.add_argument("-f", type=int, default=0)
+            parser.add_argument("-s", type=str, default=None, help="shard rank/world")
 
             args = parser.parse_args(args)
             return args
@@ -188,68 +388,259 @@ class ParallelerGrid:
         t = args.t
         c = args.c
         self.f = args.f
+        if args.s is not None:
+            self.shard = tuple(map(int, args.s.split("/")))
 
         if cp:
-            if t in "run debug".split():
-                cp_pys(self.exp_script_dir, self.scr_dir)
-                cp_pys(self.base_script_dir, self.scr_dir)
+            if t in "run debug serve".split():
+                self.snapshot()
+
+        try:
+            self._execute(t, c)
+        finally:
+            self.close_workers()
+            if self.notifier is not None:
+                self.notifier.close()
 
+    def _execute(self, t, c):
         if t == "show":
             self.show(c)
         elif t == "run":
             self.run()
-            if self.phone_notice:
-                send_autodl(**self.phone_notice)
+            self.notify_done()
         elif t == "debug":
             self.debug()
         elif t == "clear":
             self.clear()
         elif t == "check":
             self.check_finish(True)
+        elif t == "index":
+            self.check_finish(False, full=True)
+        elif t == "serve":
+            self.serve()
+            self.notify_done()
+        elif t == "work":
+            self.work()
+        elif t == "report":
+            self.report()
+
+    def snapshot(self):
+        """store the script dirs in scr_dir, unchanged files cost a stat"""
+        return self.snapshots.snapshot([self.exp_script_dir, self.base_script_dir])
 
     def func(self, dev, cfg):
+        """build the Command of cfg on dev, mp_exec launches it without a shell"""
         folder = self.cfg2dirname(cfg)
         log_dir = os.path.join(self.exp_dir, folder)
         os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, "log_out.txt")
+        prune_flag = os.path.join(log_dir, PRUNE_FLAG)
+        if os.path.exists(prune_flag):  # a forced rerun is judged again
+            os.remove(prune_flag)
+        capture = OutputCapture(log_dir, **self.capture)
+        if self.layout == "hash":
+            self.register_layout([cfg])
+            json.dump(
+                dict(config=cfg, code=self.code_digest()),
+                open(os.path.join(log_dir, "config.json"), "w"),
+                indent=2,
+                default=repr,
+            )
+
+        def on_exit(code):
+            pruned = os.path.exists(prune_flag)
+            if code and not pruned:
+                print(f"Exit {code} cfg {cfg}, last lines :\n{capture.tail(20, metrics=False)}")
+            if not self.remote:
+                self.index.update(folder)
+                self.job_exited(cfg, code, pruned)
 
-        cmd = f'{self.cmd} --{self.gpu_arg} {dev} --{self.log_arg} "{log_dir}" > "{log_file}" '
+        args = shlex.split(self.cmd)
+        args += [f"--{self.gpu_arg}", dev, f"--{self.log_arg}", log_dir]
         for pname, value in cfg.items():
-            cmd += f" --{pname} {value}"
-        open(os.path.join(log_dir, "cmd.txt"), "w").write(cmd)
+            args += [f"--{pname}", value]
+        if self.warm is not None:
+            cmd = self.warm_command(dev, args, capture, on_exit)
+        else:
+            cmd = Command(args, capture=capture, on_exit=on_exit)
+        open(os.path.join(log_dir, "cmd.txt"), "w").write(str(cmd))
         print("CMD ", cmd)
+        return cmd
+
+    def warm_command(self, dev, args, capture, on_exit):
+        entry = self.warm.get("entry")
+        if entry is None:
+            if len(args) < 2 or not os.path.basename(args[0]).startswith("python"):
+                raise ValueError(f"warm needs an entry, cmd {self.cmd} is no script")
+            entry, args = args[1], args[2:]
+        else:
+            args = args[len(shlex.split(self.cmd)) :]
+        return WarmCommand(self.workers, dev, entry, args, capture, on_exit)
+
+    def notify(self, event, content):
+        """send content if event is one of the notice events, without blocking"""
+        if self.notifier is not None and event in self.notice_events:
+            self.notifier.notify(content)
+
+    def notify_done(self):
+        planned, exited, failed = self._jobs
+        content = self.phone_notice.get("content", "done") if self.phone_notice else ""
+        if exited:
+            content = f"{content} : {exited} jobs, {failed} failed"
+        self.notify("done", content)
 
-        os.system(cmd)
+    def job_exited(self, cfg, code, pruned=False):
+        """count the exited jobs, for the job, fail and milestone notices"""
+        with self._jobs_lock:
+            self._jobs[1] += 1
+            self._jobs[2] += bool(code) and not pruned
+            planned, exited, failed = self._jobs
+        if pruned:
+            self.notify("job", f"pruned : {self.cfg2dirname(cfg)}")
+        elif code and "fail" in self.notice_events:
+            self.notify("fail", f"exit {code} : {self.cfg2dirname(cfg)}")
+        else:
+            self.notify("job", f"exit {code} : {self.cfg2dirname(cfg)}")
+        if planned and exited * 4 // planned > (exited - 1) * 4 // planned:
+            self.notify(
+                "milestone", f"{exited}/{planned} jobs exited, {failed} failed"
+            )
+
+    def close_workers(self):
+        if self.workers is not None:
+            self.workers.close()
+
+    def results(self, metrics=None, **kwargs):
+        """Results of the finished runs, see results.py"""
+        return Results(self, metrics, **kwargs)
 
-    def show(self):
-        pass
+    def show(self, c=0):
+        """last value of every metric per run, overwrite to customize"""
+        print(self.results().last().to_string())
 
     def debug(self):
-        cfg = self.get_configs()[0]
+        cfg = next(self.iter_configs())
         cfg[self.epoch_arg] = 2
-        self.func(self.resources[0], cfg)
+        self.func(self.resources[0], cfg).run()
+
+    def get_pool(self, configs):
+        """@ return : the resources and cost function handed to mp_exec"""
+        if self.arbiter is not None:
+            pool = ArbiterPool(
+                self.arbiter,
+                self.priority,
+                key_file=self.arbiter_key_file or KEY_FILE,
+                shared=self.arbiter_shared,
+            )
+            return pool, None
+        if self.capacity is None:
+            return self.resources, None
+        if isinstance(self.capacity, CapacityModel):
+            model = self.capacity
+        elif self.capacity == "cuda":
+            model = CudaCapacity()
+        else:
+            model = FixedCapacity(self.capacity)
+        pool = CapacityPool(self.resources, model)
+        rows = self.index.refresh([self.cfg2dirname(cfg) for cfg in configs])
+        cost = MemoryCost(rows, self.cfg2dirname, self.mem_default)
+        return pool, cost.fit(configs)
+
+    def get_monitor(self):
+        if self.adaptive is None:
+            return None
+        state_path = os.path.join(self.ana_dir, "halving.json")
+        if self.f and os.path.exists(state_path):
+            # the rung records of the runs forced again would exempt them
+            print(f"Halving : -f, clear the rung records of {state_path}")
+            os.remove(state_path)
+        halving = SuccessiveHalving(state_path=state_path, **self.adaptive)
+        return HalvingMonitor(
+            halving, lambda cfg: os.path.join(self.exp_dir, self.cfg2dirname(cfg))
+        )
 
     def run(self):
         configs = self.get_configs()
-        finish, _ = self.check_finish(False)
+        pool, cost = self.get_pool(configs)
+        slots = self.slot_count(pool, cost, configs)
+        finish, _ = self.check_finish(False, configs=configs, slots=slots)
         idxs = sorted(
             list(set(list(range(len(configs)))) - set([x[0] for x in finish]))
         )
         print("config idxs to run: ", idxs)
         if not self.f:
             configs = [configs[i] for i in idxs]
+        self.register_layout(configs)
+        # longest expected first shortens the tail of the sweep
+        model = self.runtime_model
+        if model.fitted:
+            configs = sorted(configs, key=lambda cfg: -model.predict(cfg))
+        monitor = self.get_monitor()
+        telemetry = Telemetry(self.telemetry_path)
+        self._jobs = [len(configs), 0, 0]
         if not self.trial:
-            mp_exec(self.resources, configs, self.func)
+            mp_exec(
+                pool,
+                configs,
+                self.func,
+                cost=cost,
+                monitor=monitor,
+                telemetry=telemetry,
+            )
         else:
             mp_exec_trial(
-                self.resources,
+                pool,
                 configs,
                 self.func,
                 self.check_done,
                 self.remove_run_flag,
                 self.trial_time,
+                cost=cost,
+                monitor=monitor,
+                telemetry=telemetry,
             )
 
+    def report(self):
+        """device utilization of the last run, from the telemetry in ana_dir"""
+        if not os.path.exists(self.telemetry_path):
+            print(f"No telemetry at {self.telemetry_path}, run -t run first")
+            return {}
+        return report(self.telemetry_path)
+
+    def serve(self):
+        """coordinate the unfinished configs between worker agents of several nodes"""
+        configs = self.get_configs()
+        finish, unfinish = self.check_finish(False, configs=configs)
+        if self.f:
+            unfinish = list(enumerate(configs))
+        else:
+            unfinish = [x for x in enumerate(configs) if x[0] not in dict(finish)]
+        self.register_layout([cfg for _, cfg in unfinish])
+        model = self.runtime_model
+        if model.fitted:
+            unfinish.sort(key=lambda x: -model.predict(x[1]))
+        configs = [cfg for _, cfg in unfinish]
+        self._jobs = [len(configs), 0, 0]
+
+        def on_report(idx, cfg, code):
+            folder = self.cfg2dirname(cfg)
+            self.index.update(folder)
+            pruned = os.path.exists(os.path.join(self.exp_dir, folder, PRUNE_FLAG))
+            self.job_exited(cfg, code, pruned)
+
+        return Coordinator(
+            configs, self.coordinator, self.get_authkey(), on_report=on_report
+        ).serve()
+
+    def get_authkey(self):
+        if self.coord_authkey is not None:
+            return self.coord_authkey
+        return authkey_file(os.path.join(self.log_dir, "coord.key"))
+
+    def work(self):
+        """worker agent, run configs claimed from the coordinator on the local gpus"""
+        self.remote = True
+        return work(self.coordinator, self.resources, self.func, self.get_authkey())
+
     def clear(self):
         log_dir = os.path.abspath(self.log_dir)
         print(f"Removing {log_dir} ? y or n ")
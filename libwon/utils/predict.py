@@ -0,0 +1,86 @@
+import heapq
+import math
+
+
+def _numeric(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+class RuntimeModel:
+    """
+    Log-linear ridge model of the run time of a config, fitted on the all_time
+    of finished runs. Numeric values enter as log(1+|x|) so that time scaling
+    with e.g. epochs is captured, other values are one-hot encoded.
+    @ ignore : keys not affecting the run time
+    """
+
+    def __init__(self, ignore=("seed",), ridge=1e-3):
+        self.ignore = set(ignore)
+        self.ridge = ridge
+        self.features = None
+        self.coef = None
+        self.mean = None
+
+    def _columns(self, configs):
+        cols = {}
+        for cfg in configs:
+            for k, v in cfg.items():
+                if k in self.ignore:
+                    continue
+                cols[(k,) if _numeric(v) else (k, str(v))] = None
+        return list(cols)
+
+    def _row(self, cfg):
+        x = [1.0]
+        for col in self.features:
+            v = cfg.get(col[0])
+            if len(col) == 1:
+                x.append(math.log1p(abs(v)) if _numeric(v) else 0.0)
+            else:
+                x.append(1.0 if v is not None and str(v) == col[1] else 0.0)
+        return x
+
+    def fit(self, configs, times):
+        import numpy as np
+
+        times = [max(float(t), 1e-3) for t in times]
+        if not times:
+            return self
+        self.mean = float(np.mean(times))
+        self.features = self._columns(configs)
+        X = np.array([self._row(cfg) for cfg in configs])
+        y = np.log(times)
+        A = X.T @ X + self.ridge * np.eye(X.shape[1])
+        self.coef = np.linalg.solve(A, X.T @ y)
+        return self
+
+    @property
+    def fitted(self):
+        """True once fitted on at least one finished run"""
+        return self.coef is not None
+
+    def predict(self, cfg):
+        """@ return : seconds, None before any finished run"""
+        if self.coef is None:
+            return self.mean
+        return float(math.exp(sum(a * b for a, b in zip(self.coef, self._row(cfg)))))
+
+
+def simulate(slots, remaining, times):
+    """
+    List-schedule jobs onto slots, the way mp_exec dispatches them.
+    @ slots : number of concurrent jobs
+    @ remaining : seconds left of each running job
+    @ times : predicted seconds of each pending job, in dispatch order
+    @ return : finish time of each pending job, and the makespan
+    """
+    free = sorted(remaining)[:slots]
+    free += [0.0] * (slots - len(free))
+    heapq.heapify(free)
+    finish = []
+    for t in times:
+        start = heapq.heappop(free)
+        finish.append(start + t)
+        heapq.heappush(free, start + t)
+    makespan = max(finish + list(remaining) + [0.0])
+    return finish, makespan
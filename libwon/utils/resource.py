@@ -0,0 +1,148 @@
+from collections import deque
+
+
+class SlotPool:
+    """one job per entry of resources, repeat a device id to run more jobs on it"""
+
+    def __init__(self, resources):
+        self.free = deque(resources)
+        self.size = len(self.free)
+
+    def __len__(self):
+        return self.size
+
+    def acquire(self, cost=None):
+        """@ return : a device, or None if all slots are busy"""
+        return self.free.popleft() if self.free else None
+
+    def release(self, dev, cost=None):
+        self.free.append(dev)
+
+    def full(self):
+        return not self.free
+
+
+class CapacityModel:
+    """capacity of a device, in the same unit as the job costs"""
+
+    def capacity(self, dev):
+        raise NotImplementedError
+
+
+class FixedCapacity(CapacityModel):
+    """
+    @ capacities : {dev: capacity}, e.g. {0: 24000, 1: 24000} in MB
+    """
+
+    def __init__(self, capacities):
+        self.capacities = dict(capacities)
+
+    def capacity(self, dev):
+        return self.capacities[dev]
+
+
+class CudaCapacity(CapacityModel):
+    """total memory of cuda devices in MB, times fraction"""
+
+    def __init__(self, fraction=0.95):
+        self.fraction = fraction
+
+    def capacity(self, dev):
+        import torch
+
+        t = torch.cuda.get_device_properties(f"cuda:{dev}").total_memory
+        return t / (1024**2) * self.fraction
+
+
+class CapacityPool:
+    """
+    Bin-pack jobs onto devices by cost without oversubscribing them.
+    A job costlier than a whole device is clamped to run alone on it.
+    @ devices : device ids
+    @ model : CapacityModel
+    @ max_jobs : optional cap of concurrent jobs per device
+    """
+
+    def __init__(self, devices, model, max_jobs=None):
+        self.devices = list(dict.fromkeys(devices))
+        self.model = model
+        self.max_jobs = max_jobs
+        self.caps = {d: model.capacity(d) for d in self.devices}
+        self.used = {d: 0 for d in self.devices}
+        self.jobs = {d: 0 for d in self.devices}
+
+    def __len__(self):
+        return len(self.devices) * (self.max_jobs or 32)
+
+    def _cost(self, dev, cost):
+        return min(cost or 0, self.caps[dev])
+
+    def acquire(self, cost=None):
+        best, best_left = None, None
+        for d in self.devices:
+            if self.max_jobs is not None and self.jobs[d] >= self.max_jobs:
+                continue
+            left = self.caps[d] - self.used[d] - self._cost(d, cost)
+            # best fit keeps large holes for large jobs
+            if left >= 0 and (best is None or left < best_left):
+                best, best_left = d, left
+        if best is not None:
+            self.used[best] += self._cost(best, cost)
+            self.jobs[best] += 1
+        return best
+
+    def release(self, dev, cost=None):
+        self.used[dev] -= self._cost(dev, cost)
+        self.jobs[dev] -= 1
+
+    def full(self):
+        return False
+
+
+class MemoryCost:
+    """
+    Estimate the GPU memory (MB) of a config from the GPU_MEM_reserved_MB that
+    COLLECTOR.add_GPU_MEM recorded in previous runs.
+    @ rows : {folder: index row}, see ExpIndex.rows
+    @ cfg2dirname : f(cfg) -> folder
+    @ default : cost of configs without any record
+    @ ignore : keys that do not change memory, configs equal on the other keys share records
+    @ overhead : added to recorded values, memory_reserved misses the cuda context
+    """
+
+    key = "GPU_MEM_reserved_MB"
+
+    def __init__(self, rows, cfg2dirname, default, ignore=("seed",), overhead=512):
+        self.rows = rows
+        self.cfg2dirname = cfg2dirname
+        self.default = default
+        self.ignore = set(ignore)
+        self.overhead = overhead
+        self.similar = {}
+
+    def _similar_key(self, cfg):
+        return tuple(
+            sorted((k, str(v)) for k, v in cfg.items() if k not in self.ignore)
+        )
+
+    def _recorded(self, cfg):
+        row = self.rows.get(self.cfg2dirname(cfg))
+        if row is None:
+            return None
+        return row["metrics"].get(self.key)
+
+    def fit(self, configs):
+        for cfg in configs:
+            mem = self._recorded(cfg)
+            if mem is not None:
+                k = self._similar_key(cfg)
+                self.similar[k] = max(self.similar.get(k, 0), mem)
+        return self
+
+    def __call__(self, cfg):
+        mem = self._recorded(cfg)
+        if mem is None:
+            mem = self.similar.get(self._similar_key(cfg))
+        if mem is None:
+            return self.default
+        return mem + self.overhead
@@ -0,0 +1,239 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from . import colfile
+
+CACHE_VERSION = 2  # bumped when the table layout changes
+
+
+def _numeric(values):
+    return (
+        isinstance(values, list)
+        and len(values) > 0
+        and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        )
+    )
+
+
+def _scalar(values):
+    return (
+        isinstance(values, list)
+        and len(values) > 0
+        and isinstance(values[-1], (str, int, float, bool))
+    )
+
+
+def _read_run(args):
+    """
+    @ return : (folder, {metric: list of numbers}, {key: last value}) of a
+        finished run, the last are the other keys ending with a scalar, e.g. a
+        string; (folder, None, None) if unreadable
+    """
+    folder, path, metrics = args
+    from .collector import Collector
+
+    c = Collector()  # a collector of its own, nothing shared between runs
+    try:
+        c.load(path, keys=metrics)
+    except Exception as e:
+        print(f"Results : cannot read {path} {e!r}")
+        return folder, None, None
+    numeric = {k: v for k, v in c.cache.items() if _numeric(v)}
+    last = {
+        k: v[-1] for k, v in c.cache.items() if k not in numeric and _scalar(v)
+    }
+    return folder, numeric, last
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class Results:
+    """
+    Finished runs of a ParallelerGrid as one pandas table with a row per (run,
+    epoch): the collect_keys hyperparameter columns, folder, epoch, and a column
+    per numeric collector key whose i-th value sits at epoch i (NaN past its
+    end, so scalars such as all_time sit at epoch 0). Other keys, e.g. strings,
+    are object columns holding their last value on every row of the run.
+    Collector keys named as a hyperparameter are left to its column.
+    The table is cached in ana_dir/results.pkl, refresh only rereads the runs
+    whose collector file changed.
+    @ metrics : collector keys to load, None for every numeric key
+    @ workers : processes parsing the collector files
+    """
+
+    def __init__(self, paralleler, metrics=None, workers=None, cache=True):
+        self.p = paralleler
+        self.metrics = None if metrics is None else list(metrics)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.cache_path = (
+            os.path.join(paralleler.ana_dir, "results.pkl") if cache else None
+        )
+        self.hp = paralleler.collect_keys(paralleler.grid_list)
+        self.table = None
+        self.index = {}  # folder -> stamp of its collector file
+
+    def _load_cache(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "rb") as f:
+                c = pickle.load(f)
+        except Exception:
+            return
+        if (
+            c.get("version") == CACHE_VERSION
+            and c["metrics"] == self.metrics
+            and c["hp"] == self.hp
+        ):
+            self.table, self.index = c["table"], c["index"]
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                dict(
+                    version=CACHE_VERSION,
+                    metrics=self.metrics,
+                    hp=self.hp,
+                    table=self.table,
+                    index=self.index,
+                ),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, self.cache_path)
+
+    def _build(self, runs):
+        """@ runs : [(cfg, folder, {metric: values}, {key: last})] -> long table"""
+        import numpy as np
+        import pandas as pd
+
+        hp = set(self.hp)
+        keys = sorted({k for _, _, m, _ in runs for k in m} - hp)
+        others = sorted({k for _, _, _, o in runs for k in o} - hp - set(keys))
+        cols = {k: [] for k in self.hp + ["folder", "epoch"] + keys + others}
+        for cfg, folder, m, o in runs:
+            n = max(len(v) for v in m.values()) if m else 1
+            for k in self.hp:
+                cols[k].extend([cfg.get(k, np.nan)] * n)
+            cols["folder"].extend([folder] * n)
+            cols["epoch"].append(np.arange(n))
+            for k in keys:
+                a = np.full(n, np.nan)
+                v = m.get(k)
+                if v:
+                    a[: len(v)] = v
+                cols[k].append(a)
+            for k in others:
+                a = np.empty(n, dtype=object)
+                a[:] = [o.get(k)] * n
+                cols[k].append(a)
+        for k in ["epoch"] + keys:
+            cols[k] = np.concatenate(cols[k]) if cols[k] else np.empty(0)
+        for k in others:
+            cols[k] = np.concatenate(cols[k])
+        return pd.DataFrame(cols)
+
+    def refresh(self, full=False):
+        """load the runs that finished or changed since the cached table"""
+        import pandas as pd
+
+        if self.table is None and not full:
+            self._load_cache()
+        p = self.p
+        cfgs = {}
+        for cfg in p.iter_configs():
+            cfgs.setdefault(p.cfg2dirname(cfg), cfg)
+        paths = {
+            f: colfile.resolve(os.path.join(p.exp_dir, f, p.finish_file)) for f in cfgs
+        }
+        stamps = {f: _stamp(path) for f, path in paths.items()}
+        stamps = {f: s for f, s in stamps.items() if s is not None}
+        index = {} if full else self.index
+        todo = [f for f, s in stamps.items() if index.get(f) != s]
+        gone = set(index) - set(stamps)
+        if self.table is not None and not full and not todo and not gone:
+            return self.table
+        jobs = [(f, paths[f], self.metrics) for f in todo]
+        if len(jobs) > 64 and self.workers > 1:
+            with ProcessPoolExecutor(self.workers) as pool:
+                read = list(pool.map(_read_run, jobs, chunksize=64))
+        else:
+            read = [_read_run(j) for j in jobs]
+        runs = [(cfgs[f], f, m, o) for f, m, o in read if m is not None]
+        new = self._build(runs)
+        old = self.table if self.table is not None and not full else None
+        if old is not None:
+            old = old[~old["folder"].isin(set(todo) | gone)]
+            new = pd.concat([old, new], ignore_index=True)
+        self.table = new
+        self.index = dict(stamps)
+        for f, m, _ in read:
+            if m is None:
+                self.index.pop(f, None)
+        self._save_cache()
+        print(
+            f"Results : {self.table['folder'].nunique()} runs, {len(todo)} read, "
+            f"{len(gone)} dropped"
+        )
+        return self.table
+
+    def _runs(self, table):
+        return self.refresh() if table is None else table
+
+    def last(self, table=None):
+        """one row per run with the last value of every metric"""
+        t = self._runs(table)
+        metrics = [c for c in t.columns if c not in self.hp + ["folder", "epoch"]]
+        last = t.groupby("folder", sort=False)[metrics].last()
+        return t.drop_duplicates("folder").set_index("folder")[self.hp].join(last)
+
+    def best_epoch(self, metric, mode="max", table=None):
+        """one row per run: the epoch where metric is best, with every metric at it"""
+        t = self._runs(table)
+        t = t[t[metric].notna()]
+        g = t.groupby("folder", sort=False)[metric]
+        idx = g.idxmax() if mode == "max" else g.idxmin()
+        return t.loc[idx.values].set_index("folder")
+
+    def group(self, runs, over=("seed",), metrics=None):
+        """
+        mean and std over the configs differing only by the over columns
+        @ runs : per-run table, e.g. last() or best_epoch(...)
+        @ metrics : columns to aggregate, every numeric one by default
+        """
+        import pandas as pd
+
+        over = [over] if isinstance(over, str) else list(over)
+        by = [k for k in self.hp if k not in over]
+        if metrics is None:
+            metrics = [
+                c
+                for c in runs.columns
+                if c not in self.hp + ["epoch", "folder"]
+                and pd.api.types.is_numeric_dtype(runs[c])
+            ]
+        runs = runs.reset_index()
+        agg = runs.groupby(by, dropna=False, sort=True)[list(metrics)].agg(
+            ["mean", "std"]
+        )
+        agg[("runs", "count")] = runs.groupby(by, dropna=False, sort=True).size()
+        return agg
+
+    @staticmethod
+    def top(table, metric, k=10, mode="max"):
+        """the k best rows of a per-run or grouped table by metric"""
+        if table.columns.nlevels > 1:  # a grouped table, rank by the mean
+            metric = (metric, "mean")
+        if mode == "max":
+            return table.nlargest(k, metric)
+        return table.nsmallest(k, metric)
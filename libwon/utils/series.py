@@ -0,0 +1,132 @@
+POLICIES = ["all", "window", "stride", "reservoir", "stats"]
+
+
+class Series:
+    """
+    Numeric values of a collector key kept in a growable numpy array.
+    Indexing, len and iteration work on the kept values like on a list.
+    policy bounds the memory of long runs:
+        all : keep every value
+        window : keep the last size values
+        stride : keep every stride-th value, doubling the stride when size is reached
+        reservoir : keep a uniform sample of size values
+        stats : keep no value, only the accumulators
+    count/min/max/mean/last are exact over every value added whatever the policy.
+    """
+
+    def __init__(self, policy="all", size=10000, dtype="float64", seed=0):
+        import numpy as np
+
+        if policy not in POLICIES:
+            raise ValueError(f"policy {policy} is unknown!")
+        self.policy = policy
+        self.size = size
+        kept = {"all": 16, "stats": 0}.get(policy, size)
+        self.data = np.empty(kept, dtype=dtype)
+        self.index = np.empty(size, dtype=np.int64) if policy == "reservoir" else None
+        self.n = 0  # values kept
+        self.total = 0  # values added
+        self.stride = 1
+        self.rng = np.random.default_rng(seed) if policy == "reservoir" else None
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def append(self, value):
+        value = float(value)
+        i = self.total
+        self.total += 1
+        self.sum += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        policy = self.policy
+        if policy == "all":
+            if self.n == len(self.data):
+                self.data = self._grow(self.data)
+            self.data[self.n] = value
+            self.n += 1
+        elif policy == "window":
+            self.data[i % self.size] = value
+            self.n = min(self.n + 1, self.size)
+        elif policy == "stride":
+            if i % self.stride:
+                return
+            if self.n == self.size:
+                half = self.data[: self.n : 2].copy()
+                self.n = len(half)
+                self.data[: self.n] = half
+                self.stride *= 2
+                if i % self.stride:
+                    return
+            self.data[self.n] = value
+            self.n += 1
+        elif policy == "reservoir":
+            if self.n < self.size:
+                j = self.n
+                self.n += 1
+            else:
+                j = int(self.rng.integers(0, i + 1))
+                if j >= self.size:
+                    return
+            self.data[j] = value
+            self.index[j] = i
+
+    def _grow(self, a):
+        import numpy as np
+
+        b = np.empty(len(a) * 2, dtype=a.dtype)
+        b[: len(a)] = a
+        return b
+
+    def values(self):
+        """kept values in the order they were added, as a numpy array"""
+        import numpy as np
+
+        if self.policy == "window" and self.total > self.size:
+            start = self.total % self.size
+            return np.concatenate((self.data[start:], self.data[:start]))
+        if self.policy == "reservoir":
+            return self.data[: self.n][np.argsort(self.index[: self.n])]
+        return self.data[: self.n]
+
+    def indices(self):
+        """position among all added values of each kept value"""
+        import numpy as np
+
+        if self.policy == "window":
+            return np.arange(self.total - self.n, self.total)
+        if self.policy == "stride":
+            return np.arange(self.n) * self.stride
+        if self.policy == "reservoir":
+            return np.sort(self.index[: self.n])
+        return np.arange(self.n)
+
+    def stats(self):
+        return dict(
+            count=self.total,
+            min=self.min,
+            max=self.max,
+            mean=self.sum / self.total if self.total else None,
+            last=self.last,
+        )
+
+    def tolist(self):
+        return self.values().tolist()
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if self.policy in ("all", "stride"):
+            return self.data[: self.n][i].tolist()
+        return self.values()[i].tolist()
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __repr__(self):
+        return f"Series(policy={self.policy}, kept={self.n}, total={self.total})"
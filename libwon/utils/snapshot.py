@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .misc import convert_size
+
+
+def source_filt(root, name):
+    return name[-3:] == ".py" or name[-5:] == ".yaml"
+
+
+def _git_head(src_dir):
+    """commit of the git checkout containing src_dir, read without running git"""
+    d = os.path.abspath(src_dir)
+    while True:
+        head = os.path.join(d, ".git", "HEAD")
+        if os.path.isfile(head):
+            ref = open(head).read().strip()
+            if not ref.startswith("ref: "):
+                return ref
+            ref_file = os.path.join(d, ".git", ref[5:])
+            if os.path.isfile(ref_file):
+                return open(ref_file).read().strip()
+            packed = os.path.join(d, ".git", "packed-refs")
+            if os.path.isfile(packed):
+                for line in open(packed):
+                    if line.rstrip().endswith(" " + ref[5:]):
+                        return line.split()[0]
+            return None
+        parent = os.path.dirname(d)
+        if parent == d:
+            return None
+        d = parent
+
+
+class SnapshotStore:
+    """
+    Content-addressed snapshots of the script dirs of a sweep, replacing cp_pys.
+    Files are stored once under blobs/ by sha1 and hard-linked (copied across
+    filesystems) into the tree root/<basename of src_dir>/ (suffixed _2, _3, ...
+    for other dirs of the same basename), which always holds the latest launch.
+    Each launch writes manifests/<launch>.json with the sha1 of every file, the
+    git commit and what was added/changed/removed, so an older snapshot can be
+    rebuilt with checkout. Hashes are reused while the size and mtime of a file
+    do not change, so a launch without edits only stats files.
+    @ root : e.g. log_dir/scripts
+    @ skip_dirs : dir names not walked at all
+    """
+
+    def __init__(
+        self, root, workers=8, skip_dirs=(".git", "__pycache__", ".ipynb_checkpoints")
+    ):
+        self.root = root
+        self.workers = workers
+        self.skip_dirs = set(skip_dirs)
+        self.blob_dir = os.path.join(root, "blobs")
+        self.manifest_dir = os.path.join(root, "manifests")
+        self.stat_path = os.path.join(root, "stat.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    def _walk(self, src_dir, filt):
+        for root, dirs, files in os.walk(src_dir):
+            dirs[:] = sorted(d for d in dirs if d not in self.skip_dirs)
+            for name in files:
+                if filt(root, name):
+                    yield os.path.join(root, name)
+
+    def _blob(self, sha):
+        return os.path.join(self.blob_dir, sha[:2], sha)
+
+    def _hash(self, path):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest(), 0
+
+    def _store(self, path):
+        """@ return : sha1 of path, bytes newly stored"""
+        sha, _ = self._hash(path)
+        blob = self._blob(sha)
+        if os.path.exists(blob):
+            return sha, 0
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp)
+        os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)  # linked, so read-only
+        os.replace(tmp, blob)
+        return sha, os.path.getsize(blob)
+
+    def _link(self, sha, dst):
+        blob = self._blob(sha)
+        try:
+            if os.path.samefile(blob, dst):
+                return
+            os.remove(dst)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(blob, dst)
+        except OSError:  # another filesystem, or no hard links
+            shutil.copyfile(blob, dst)
+
+    def manifests(self):
+        """launch names, oldest first"""
+        names = os.listdir(self.manifest_dir)
+        return sorted(f[:-5] for f in names if f.endswith(".json"))
+
+    def manifest(self, launch=None):
+        """manifest of launch, the latest one by default, None if there is none"""
+        launches = self.manifests()
+        if not launches:
+            return None
+        launch = launch or launches[-1]
+        return json.load(open(os.path.join(self.manifest_dir, launch + ".json")))
+
+    def _scan(self, src_dirs, filt, pool, store):
+        """@ return : {name: src_dir}, {relative path: sha1}, bytes newly stored"""
+        srcs = {}
+        for d in src_dirs:
+            if d is None:
+                continue
+            d = os.path.abspath(d)
+            if d in srcs.values():
+                continue
+            # other dirs of the same basename go to name_2, name_3, ...
+            name = base = os.path.basename(d)
+            i = 1
+            while name in srcs:
+                i += 1
+                name = f"{base}_{i}"
+            srcs[name] = d
+        try:
+            cache = json.load(open(self.stat_path))
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        files, todo = {}, {}
+        for name, src in srcs.items():
+            for path in self._walk(src, filt):
+                rel = os.path.join(name, os.path.relpath(path, src))
+                st = os.stat(path)
+                c = cache.get(path)
+                if c is not None and c[:2] == [st.st_size, st.st_mtime_ns]:
+                    if not store or os.path.exists(self._blob(c[2])):
+                        files[rel] = c[2]
+                        continue
+                todo[rel] = (path, [st.st_size, st.st_mtime_ns])
+        stored = 0
+        rels = list(todo)
+        paths = [todo[r][0] for r in rels]
+        for rel, (sha, n) in zip(
+            rels, pool.map(self._store if store else self._hash, paths)
+        ):
+            files[rel] = sha
+            cache[todo[rel][0]] = todo[rel][1] + [sha]
+            stored += n
+        if todo:
+            tmp = f"{self.stat_path}.{os.getpid()}.tmp"
+            json.dump(cache, open(tmp, "w"))
+            os.replace(tmp, self.stat_path)
+        return srcs, dict(sorted(files.items())), stored
+
+    @staticmethod
+    def _digest(files):
+        lines = "".join(f"{rel} {sha}\n" for rel, sha in sorted(files.items()))
+        return hashlib.sha1(lines.encode()).hexdigest()
+
+    def digest(self, src_dirs, filt=source_filt, exclude=()):
+        """
+        digest of the scripts as snapshot would store them, storing nothing
+        @ exclude : paths left out, e.g. the launcher script holding the grid
+        """
+        exclude = {os.path.abspath(p) for p in exclude}
+
+        def keep(root, name):
+            path = os.path.abspath(os.path.join(root, name))
+            return filt(root, name) and path not in exclude
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            _, files, _ = self._scan(src_dirs, keep, pool, store=False)
+        return self._digest(files)
+
+    def snapshot(self, src_dirs, filt=source_filt):
+        """
+        @ src_dirs : script dirs, the same dir given twice is stored once
+        @ return : the manifest of this launch, its digest identifies the code
+        """
+        start = time.time()
+        with ThreadPoolExecutor(self.workers) as pool:
+            srcs, files, stored = self._scan(src_dirs, filt, pool, store=True)
+            dsts = [os.path.join(self.root, r) for r in files]
+            list(pool.map(self._link, files.values(), dsts))
+        prev = self.manifest()
+        prev_files = prev["files"] if prev is not None else {}
+        for rel in set(prev_files) - set(files):
+            dst = os.path.join(self.root, rel)
+            if os.path.exists(dst):
+                os.remove(dst)
+        now = time.time()
+        ms = int(now * 1000) % 1000
+        manifest = dict(
+            launch=f"{time.strftime('%Y%m%d-%H%M%S')}.{ms:03d}-{os.getpid()}",
+            time=now,
+            sources=srcs,
+            git={name: _git_head(src) for name, src in srcs.items()},
+            digest=self._digest(files),
+            files=files,
+            added=sorted(set(files) - set(prev_files)),
+            changed=sorted(
+                r for r in files if r in prev_files and prev_files[r] != files[r]
+            ),
+            removed=sorted(set(prev_files) - set(files)),
+            stored_bytes=stored,
+        )
+        path = os.path.join(self.manifest_dir, manifest["launch"] + ".json")
+        json.dump(manifest, open(path, "w"), indent=1)
+        print(
+            f"SNAPSHOT {os.path.abspath(self.root)} : # Files={len(files)} "
+            f"# Added={len(manifest['added'])} # Changed={len(manifest['changed'])} "
+            f"# Removed={len(manifest['removed'])} Stored {convert_size(stored)} "
+            f"in {time.time() - start:.2f} S"
+        )
+        return manifest
+
+    def checkout(self, dst, launch=None):
+        """rebuild the scripts of a launch under dst"""
+        for rel, sha in self.manifest(launch)["files"].items():
+            self._link(sha, os.path.join(dst, rel))
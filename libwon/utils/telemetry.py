@@ -0,0 +1,136 @@
+import json
+import os
+import statistics
+import threading
+import time
+from .misc import convert_time
+
+
+class Telemetry:
+    """
+    JSONL timeline of the jobs of mp_exec: one "sweep" line per call, then one
+    "job" line per finished job with its device, exit code and the times it was
+    enqueued, dispatched (got a slot), started (process spawned) and exited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sweep = None
+        self.lock = threading.Lock()
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def start(self, slots):
+        """@ slots : {dev: number of slots}, None when the pool does not know"""
+        self.sweep = f"{time.time():.6f}-{os.getpid()}"
+        self._write(dict(event="sweep", sweep=self.sweep, start=time.time(), slots=slots))
+
+    def job(self, cfg, dev, enqueued, dispatched, started, exited, code):
+        self._write(
+            dict(
+                event="job",
+                sweep=self.sweep,
+                cfg=cfg,
+                dev=dev,
+                enqueued=enqueued,
+                dispatched=dispatched,
+                started=started,
+                exited=exited,
+                code=code,
+            )
+        )
+
+
+def _busy(intervals):
+    """length of the union of [start, end) intervals"""
+    total, end = 0.0, None
+    for s, e in sorted(intervals):
+        if end is None or s > end:
+            total += e - s
+            end = e
+        elif e > end:
+            total += e - end
+            end = e
+    return total
+
+
+def _stat(values):
+    if not values:
+        return "NaN"
+    return (
+        f"mean={convert_time(statistics.mean(values))} "
+        f"p50={convert_time(statistics.median(values))} max={convert_time(max(values))}"
+    )
+
+
+def _ratio(a, b):
+    """a / b, 0 for a sweep of zero duration"""
+    return a / b if b > 0 else 0.0
+
+
+def report(path, sweep=None):
+    """
+    Print the utilization of a sweep (the last one by default) from a Telemetry file.
+    @ return : dict of the figures printed
+    """
+    sweeps, jobs = {}, {}
+    for line in open(path):
+        try:
+            r = json.loads(line)
+        except ValueError:
+            continue
+        if r["event"] == "sweep":
+            sweeps[r["sweep"]] = r
+        else:
+            jobs.setdefault(r["sweep"], []).append(r)
+    if not sweeps:
+        print(f"No sweep in {path}")
+        return {}
+    sweep = sweep or max(sweeps, key=lambda k: sweeps[k]["start"])
+    start = sweeps[sweep]["start"]
+    slots = sweeps[sweep]["slots"] or {}
+    js = jobs.get(sweep, [])
+    if not js:
+        print(f"No finished job in sweep {sweep}")
+        return {}
+    makespan = max(j["exited"] for j in js) - start
+    durations = [j["exited"] - j["started"] for j in js]
+    n_slots = sum(slots.values()) or len({str(j["dev"]) for j in js})
+    ideal = max(max(durations), sum(durations) / n_slots)
+    res = dict(
+        sweep=sweep,
+        jobs=len(js),
+        failed=sum(1 for j in js if j["code"] not in (0, None, "pruned")),
+        pruned=sum(1 for j in js if j["code"] == "pruned"),
+        makespan=makespan,
+        ideal=ideal,
+        devices={},
+    )
+    print(
+        f"Sweep {sweep} : # Jobs={res['jobs']} # Failed={res['failed']} "
+        f"# Pruned={res['pruned']}"
+    )
+    print(
+        f"Makespan={convert_time(makespan)} Ideal={convert_time(ideal)} "
+        f"Efficiency={_ratio(ideal, makespan):.1%}"
+    )
+    print(f"QueueWait {_stat([j['dispatched'] - j['enqueued'] for j in js])}")
+    print(f"DispatchLatency {_stat([j['started'] - j['dispatched'] for j in js])}")
+    devs = {}
+    for j in js:
+        devs.setdefault(str(j["dev"]), []).append((j["started"], j["exited"]))
+    for dev, intervals in sorted(devs.items()):
+        busy = _ratio(_busy(intervals), makespan)
+        used = sum(e - s for s, e in intervals)
+        n = slots.get(dev) or 1
+        slot_use = _ratio(used, n * makespan)
+        res["devices"][dev] = dict(busy=busy, slot_use=slot_use)
+        print(
+            f"Device {dev} : # Jobs={len(intervals)} Busy={busy:.1%} Idle={1 - busy:.1%} "
+            f"SlotUse={slot_use:.1%} ({n} slots)"
+        )
+    return res
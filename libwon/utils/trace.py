@@ -0,0 +1,173 @@
+import json
+import math
+import os
+import random
+import sys
+import threading
+from functools import wraps
+from time import perf_counter_ns
+
+__all__ = ["Tracer", "TRACER", "span"]
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "sync", "start", "path")
+
+    def __init__(self, tracer, name, sync):
+        self.tracer = tracer
+        self.name = name
+        self.sync = sync
+
+    def __enter__(self):
+        t = self.tracer
+        if not t.enabled:
+            self.start = None
+            return self
+        stack = t._stack()
+        self.path = stack[-1] + "/" + self.name if stack else self.name
+        stack.append(self.path)
+        if self.sync:
+            t._sync()
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            return False
+        end = perf_counter_ns()
+        t = self.tracer
+        if self.sync:
+            t._sync()
+            end = perf_counter_ns()
+        t._local.stack.pop()
+        t._record(self.path, self.start, end)
+        return False
+
+    def __call__(self, f):
+        tracer, name, sync = self.tracer, self.name, self.sync
+
+        @wraps(f)
+        def wrap(*args, **kw):
+            with _Span(tracer, name, sync):
+                return f(*args, **kw)
+
+        return wrap
+
+
+class Tracer:
+    """
+    Nested timing spans, aggregated per path ("outer/inner") and kept as events
+    for a Chrome trace (chrome://tracing, ui.perfetto.dev).
+    @ cuda_sync : synchronize cuda around spans by default, so that they time the
+        kernels instead of their launches
+    @ max_events : events kept for the trace, aggregates keep counting after it
+    @ max_samples : durations kept per path for the percentiles (reservoir)
+    """
+
+    def __init__(
+        self, enabled=True, cuda_sync=False, max_events=200000, max_samples=10000
+    ):
+        self.enabled = enabled
+        self.cuda_sync = cuda_sync
+        self.max_events = max_events
+        self.max_samples = max_samples
+        self.clear()
+
+    def clear(self):
+        # path -> [count, total, min, max, samples, next replaced count, reservoir w]
+        self.stats = {}
+        self.events = []
+        self.dropped = 0
+        self._local = threading.local()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            self._local.tid = threading.get_ident()
+            return self._local.stack
+
+    def _sync(self):
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_initialized():
+            torch.cuda.synchronize()
+
+    def _record(self, path, start, end):
+        d = end - start
+        s = self.stats.get(path)
+        if s is None:
+            self.stats[path] = [1, d, d, d, [d], 0, 1.0]
+        else:
+            s[0] += 1
+            s[1] += d
+            if d < s[2]:
+                s[2] = d
+            if d > s[3]:
+                s[3] = d
+            if len(s[4]) < self.max_samples:
+                s[4].append(d)
+                if len(s[4]) == self.max_samples:
+                    self._skip(s)
+            elif s[0] == s[5]:
+                s[4][random.randrange(self.max_samples)] = d
+                self._skip(s)
+        if len(self.events) < self.max_events:
+            self.events.append((path, self._local.tid, start, d))
+        else:
+            self.dropped += 1
+
+    def _skip(self, s):
+        """next sample replaced in the reservoir (algorithm L), no random per call"""
+        k = self.max_samples
+        s[6] *= math.exp(math.log(random.random()) / k)
+        s[5] = s[0] + int(math.log(random.random()) / math.log(1 - s[6])) + 1
+
+    def span(self, name, sync=None):
+        """
+        with TRACER.span("forward"): ...  or  @TRACER.span("forward")
+        @ sync : cuda synchronize around this span, defaults to cuda_sync
+        """
+        return _Span(self, name, self.cuda_sync if sync is None else sync)
+
+    def summary(self):
+        """{path: count, total_s, mean_ms, p50_ms, p99_ms, min_ms, max_ms}"""
+        res = {}
+        for path, (count, total, lo, hi, samples, _, _) in self.stats.items():
+            samples = sorted(samples)
+
+            def pct(q):
+                return samples[min(len(samples) - 1, int(q * len(samples)))] / 1e6
+
+            res[path] = dict(
+                count=count,
+                total_s=total / 1e9,
+                mean_ms=total / count / 1e6,
+                p50_ms=pct(0.5),
+                p99_ms=pct(0.99),
+                min_ms=lo / 1e6,
+                max_ms=hi / 1e6,
+            )
+        return res
+
+    def save_trace(self, path):
+        pid = os.getpid()
+        events = [
+            dict(
+                name=p.rsplit("/", 1)[-1],
+                cat=p,
+                ph="X",
+                ts=start / 1e3,
+                dur=d / 1e3,
+                pid=pid,
+                tid=tid,
+            )
+            for p, tid, start, d in self.events
+        ]
+        trace = dict(traceEvents=events, otherData=dict(dropped=self.dropped))
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+
+TRACER = Tracer()
+span = TRACER.span
@@ -0,0 +1,277 @@
+"""
+Warm workers: long-lived python processes that run jobs in-process, so torch,
+cuda and module-level data are loaded once per worker instead of once per job.
+The launcher writes one json job per line to the stdin of a worker; the worker
+writes the output of the job to its stdout followed by END, its exit code and
+its memory, then waits for the next job.
+"""
+import asyncio
+import json
+import os
+import runpy
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+END = b"\x1e\x1elibwon-warm-end "
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_job(job):
+    """run one job in this process, @ return : its exit code"""
+    from .collector import COLLECTOR
+
+    COLLECTOR.reset()
+    entry, argv = job["entry"], job["argv"]
+    saved = sys.argv, sys.path[0], os.getcwd(), dict(os.environ)
+    os.environ.update(job.get("env") or {})
+    if job.get("cwd"):
+        os.chdir(job["cwd"])
+    try:
+        if ":" in entry:  # module:function, the module is imported once
+            import importlib
+
+            module, func = entry.split(":")
+            sys.argv = [module] + argv
+            getattr(importlib.import_module(module), func)()
+        else:  # a script, run as python would run it
+            sys.argv = [entry] + argv
+            sys.path[0] = os.path.dirname(os.path.abspath(entry))
+            runpy.run_path(entry, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)
+    except BaseException as e:  # printed from the frame of the job
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        code = 1
+    finally:
+        sys.argv, sys.path[0] = saved[0], saved[1]
+        os.chdir(saved[2])
+        os.environ.clear()
+        os.environ.update(saved[3])
+        COLLECTOR.reset()
+    return code
+
+
+def main(preload=()):
+    """worker loop, python -m libwon.utils.warm [modules to preload]"""
+    import importlib
+
+    for m in preload:
+        importlib.import_module(m)
+    out = sys.stdout.buffer
+    for line in sys.stdin:
+        job = json.loads(line)
+        code = _run_job(job)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        out.write(END + f"{code} {_rss_mb():.1f}\n".encode())
+        out.flush()
+
+
+class _Worker:
+    def __init__(self, dev, preload):
+        self.dev = dev
+        env = dict(os.environ)  # libwon importable even when not installed
+        root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in [root, env.get("PYTHONPATH")] if p
+        )
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "libwon.utils.warm", *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env,
+        )
+        self.jobs = 0
+        self.base_rss = None
+        self.rss = None
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, job, write):
+        """
+        @ write : f(bytes) receiving the output of the job
+        @ return : exit code, the worker exit code if the job killed it
+        """
+        self.proc.stdin.write((json.dumps(job) + "\n").encode())
+        self.proc.stdin.flush()
+        buf = b""
+        keep = len(END) - 1
+        while True:
+            data = self.proc.stdout.read1(1 << 16)
+            if not data:  # the job crashed or was terminated with the worker
+                if buf:
+                    write(buf)
+                return self.proc.wait()
+            buf += data
+            i = buf.find(END)
+            if i < 0:
+                if len(buf) > keep:
+                    write(buf[:-keep])
+                    buf = buf[-keep:]
+                continue
+            if i:
+                write(buf[:i])
+                buf = buf[i:]
+            if b"\n" in buf:
+                code, rss = buf[len(END) :].split(b"\n", 1)[0].split()
+                self.jobs += 1
+                self.rss = float(rss)
+                if self.base_rss is None:
+                    self.base_rss = self.rss
+                return int(code)
+
+    def close(self, kill=False):
+        if self.alive():
+            if kill:
+                self.proc.terminate()
+            else:
+                self.proc.stdin.close()
+        try:
+            self.proc.wait(timeout=None if kill else 30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+class WarmWorkers:
+    """
+    Idle warm workers per device, a job takes one (or starts it) and gives it
+    back when done. A worker is recycled after max_jobs jobs, or when its memory
+    grew over (1 + max_growth) times what it used after its first job.
+    @ preload : modules imported when a worker starts, e.g. ["torch"]
+    """
+
+    def __init__(self, max_jobs=20, max_growth=0.5, preload=()):
+        self.max_jobs = max_jobs
+        self.max_growth = max_growth
+        self.preload = list(preload)
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def take(self, dev):
+        with self.lock:
+            workers = self.idle.get(dev, [])
+            while workers:
+                w = workers.pop()
+                if w.alive():
+                    return w
+        return _Worker(dev, self.preload)
+
+    def give(self, w):
+        if not w.alive():
+            return
+        if w.jobs >= self.max_jobs or (
+            self.max_growth is not None
+            and w.rss > w.base_rss * (1 + self.max_growth)
+        ):
+            print(
+                f"Warm worker of device {w.dev} recycled after {w.jobs} jobs, "
+                f"{w.rss:.0f} MB"
+            )
+            w.close()
+            return
+        with self.lock:
+            self.idle.setdefault(w.dev, []).append(w)
+
+    def close(self):
+        with self.lock:
+            workers = [w for ws in self.idle.values() for w in ws]
+            self.idle = {}
+        for w in workers:
+            w.close()
+
+
+class WarmCommand:
+    """
+    A job for mp_exec run by a warm worker of dev instead of a new interpreter.
+    @ entry : script path, or "module:function" called with sys.argv set
+    @ argv : arguments, sys.argv[1:] of the job
+    @ capture : OutputCapture receiving the output, None to print it
+    @ on_exit : f(returncode), as for Command
+    """
+
+    def __init__(
+        self, workers, dev, entry, argv, capture=None, on_exit=None, env=None
+    ):
+        self.workers = workers
+        self.dev = dev
+        self.entry = entry
+        self.argv = [str(a) for a in argv]
+        self.capture = capture
+        self.on_exit = on_exit
+        self.env = env
+        self.worker = None
+        self.started = None
+        self.exited = None
+
+    def __str__(self):
+        cmd = "(warm) " + shlex.join([self.entry] + self.argv)
+        if self.capture is not None:
+            cmd += f' > "{self.capture.path}" 2>&1'
+        return cmd
+
+    def run(self):
+        w = self.workers.take(self.dev)
+        self.worker = w
+        capture = self.capture
+        if capture is not None:
+            capture.open()
+            write = capture.feed
+        else:
+            write = sys.stdout.buffer.write
+        self.started = time.time()
+        try:
+            code = w.run(
+                dict(entry=self.entry, argv=self.argv, cwd=os.getcwd(), env=self.env),
+                write,
+            )
+        finally:
+            self.exited = time.time()
+            if capture is not None:
+                capture.close()
+            self.workers.give(w)
+        if self.on_exit is not None:
+            self.on_exit(code)
+        return code
+
+    async def run_async(self, executor=None):
+        """run in a thread of its own, a blocked worker pipe holds no shared thread"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def target():
+            try:
+                res = self.run()
+            except BaseException as e:
+                loop.call_soon_threadsafe(future.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(future.set_result, res)
+
+        threading.Thread(target=target, daemon=True).start()
+        return await future
+
+    def terminate(self):
+        """stop the job with its worker, the next job of dev starts a new one"""
+        if self.worker is not None:
+            self.worker.close(kill=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -20,7 +20,7 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     url=URL,
-    python_requires='>=3.6',
+    python_requires='>=3.8',
     install_requires=install_requires,
     packages=find_packages(),
     include_package_data=True,
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from libwon.utils.arbiter import Arbiter, ArbiterPool
+from libwon.utils.auth import authkey_file
+from libwon.utils.mp import mp_exec
+
+KEY = b"test-key"
+DEVICES = ["0", "0", "0", "1", "1", "1"]
+
+
+@pytest.fixture
+def arbiter():
+    a = Arbiter(DEVICES, ("localhost", 0), KEY).start()
+    yield a
+    a.close()
+
+
+def _pool(arbiter, priority, name):
+    return ArbiterPool(arbiter.address, priority, KEY, name=name, poll=0.02)
+
+
+def _wait_free(arbiter, n, timeout=5):
+    deadline = time.time() + timeout
+    while len(arbiter.status()["free"]) != n and time.time() < deadline:
+        time.sleep(0.02)
+    return arbiter.status()
+
+
+def test_weighted_fair_share_and_release(arbiter):
+    def run(dev, cfg):  # dummy_func with short, varied durations
+        time.sleep(0.05 + 0.02 * (cfg * 7 % 5))
+
+    pools = {"heavy": _pool(arbiter, 2, "heavy"), "light": _pool(arbiter, 1, "light")}
+    results = {}
+
+    def sweep(name):
+        results[name] = mp_exec(pools[name], list(range(40)), run)
+
+    threads = [threading.Thread(target=sweep, args=(n,)) for n in pools]
+    for t in threads:
+        t.start()
+    held = []  # leases of (heavy, light) while both sweeps have a backlog
+    while not results:
+        clients = arbiter.status()["clients"]
+        held.append(tuple(clients.get(n, {}).get("held") for n in pools))
+        time.sleep(0.01)
+    for t in threads:
+        t.join(60)
+    assert results == {n: [None] * 40 for n in pools}
+
+    # priorities 2 and 1 share the 6 slots 4 and 2
+    assert Counter(held).most_common(1)[0][0] == (4, 2)
+    assert held.count((4, 2)) >= len(held) / 2
+
+    status = arbiter.status()
+    assert sorted(status["free"]) == sorted(DEVICES)
+    assert all(c["held"] == 0 for c in status["clients"].values())
+    for p in pools.values():
+        p.close()
+
+
+def test_dropped_sweep_releases_its_leases(arbiter):
+    pool = _pool(arbiter, 1, "crash")
+    leased = [pool.acquire() for _ in range(4)]
+    assert None not in leased
+    assert len(arbiter.status()["free"]) == 2
+    pool.close()
+    status = _wait_free(arbiter, len(DEVICES))
+    assert sorted(status["free"]) == sorted(DEVICES)
+    assert "crash" not in status["clients"]
+
+
+def test_wrong_key_is_rejected(arbiter):
+    with pytest.raises(Exception):
+        ArbiterPool(arbiter.address, authkey=b"other")
+
+
+def test_shared_key_file(tmp_path):
+    private = tmp_path / "private.key"
+    key = authkey_file(str(private))
+    assert os.stat(private).st_mode & 0o777 == 0o600
+    os.chmod(private, 0o640)
+    with pytest.raises(PermissionError):
+        authkey_file(str(private))
+    assert authkey_file(str(private), shared=True) == key
+
+    shared = tmp_path / "group" / "arbiter.key"
+    authkey_file(str(shared), shared=True)
+    assert os.stat(shared).st_mode & 0o777 == 0o640
+    os.chmod(shared, 0o644)
+    with pytest.raises(PermissionError):
+        authkey_file(str(shared), shared=True)
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from libwon.utils.cloud import AutodlTransport, Notifier, make_notifier
+
+
+class Stub:
+    """local push api, failing the first fail posts with a 500"""
+
+    def __init__(self, fail=0, delay=0):
+        self.posts = []
+        self.fail = fail
+        self.delay = delay
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(stub.delay)
+                if stub.fail > 0:
+                    stub.fail -= 1
+                    self.send_response(500)
+                else:
+                    stub.posts.append(body)
+                    self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/push"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    s = Stub()
+    yield s
+    s.close()
+
+
+def _notifier(url, **kwargs):
+    kwargs = dict(dict(coalesce=0.2, backoff=0.01), **kwargs)
+    return Notifier(AutodlTransport("tok", url, timeout=(1, 1)), "sweep", **kwargs)
+
+
+def test_burst_is_coalesced(stub):
+    n = _notifier(stub.url)
+    for i in range(5):
+        n.notify(f"exit 0 : run{i}")
+    n.close()
+    assert len(stub.posts) == 1
+    post = stub.posts[0]
+    assert post["token"] == "tok" and post["name"] == "exp"
+    assert post["title"] == "sweep (5 events)"
+    assert post["content"].splitlines() == [f"exit 0 : run{i}" for i in range(5)]
+    assert (n.sent, n.failed, n.dropped) == (1, 0, 0)
+
+
+def test_single_message_keeps_its_title(stub):
+    n = _notifier(stub.url, coalesce=0)
+    n.notify("done", title="custom")
+    n.close()
+    assert [(p["title"], p["content"]) for p in stub.posts] == [("custom", "done")]
+
+
+def test_failed_posts_are_retried(stub):
+    stub.fail = 2
+    n = _notifier(stub.url, retries=3)
+    n.notify("done")
+    n.close()
+    assert [p["content"] for p in stub.posts] == ["done"]
+    assert (n.sent, n.failed) == (1, 0)
+
+
+def test_gives_up_after_retries(stub):
+    stub.fail = 10
+    n = _notifier(stub.url, retries=1)
+    n.notify("done")
+    n.close()
+    assert not stub.posts
+    assert (n.sent, n.failed) == (0, 1)
+
+
+def test_slow_server_never_blocks_notify(stub):
+    stub.delay = 0.3
+    n = _notifier(stub.url, coalesce=0.05)
+    start = time.time()
+    for i in range(20):
+        n.notify(f"event {i}")
+    assert time.time() - start < 0.1
+    n.close()
+    assert sum(len(p["content"].splitlines()) for p in stub.posts) == 20
+
+
+def test_full_queue_drops_the_oldest():
+    gate = threading.Event()
+
+    class Blocked:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, title, name, content):
+            gate.wait()
+            self.sent.append(content)
+
+    transport = Blocked()
+    n = Notifier(transport, coalesce=0, max_queue=3)
+    n.notify("first")  # taken by the sending thread, which blocks
+    time.sleep(0.1)
+    for i in range(5):
+        n.notify(f"m{i}")
+    assert n.dropped == 2
+    gate.set()
+    n.close()
+    assert "\n".join(transport.sent).split("\n") == ["first", "m2", "m3", "m4"]
+
+
+def test_make_notifier():
+    assert make_notifier(None) is None
+    n = make_notifier(dict(token="t", title="x", content="c", events=["fail"], coalesce=1))
+    assert isinstance(n.transport, AutodlTransport)
+    assert (n.transport.token, n.title, n.coalesce) == ("t", "x", 1)
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import Counter
+from multiprocessing.connection import Client
+
+import pytest
+
+from libwon.utils.coord import Coordinator, work
+
+KEY = b"test-key"
+
+
+def _agents(coord, n, func):
+    runs = [None] * n
+
+    def agent(i):
+        runs[i] = work(coord.address, [f"n{i}-0", f"n{i}-1"], func, KEY, f"n{i}", 0.05)
+
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, runs
+
+
+def test_every_config_runs_once():
+    configs = list(range(30))
+    ran = Counter()
+    reported = Counter()
+    lock = threading.Lock()
+
+    def func(dev, cfg):
+        with lock:
+            ran[cfg] += 1
+        time.sleep(0.01 * (cfg % 4))
+        return cfg % 3
+
+    def on_report(idx, cfg, code):
+        with lock:
+            reported[cfg] += 1
+
+    coord = Coordinator(configs, ("localhost", 0), KEY, on_report).start()
+    threads, runs = _agents(coord, 3, func)
+    codes = coord.wait()
+    for t in threads:
+        t.join(30)
+    assert codes == {i: cfg % 3 for i, cfg in enumerate(configs)}
+    assert ran == Counter(configs) and reported == Counter(configs)
+    # the agents shared the work, each config on exactly one of them
+    assert sorted(i for r in runs for i in r) == list(range(len(configs)))
+    assert all(r for r in runs)
+
+
+def test_configs_of_a_lost_worker_are_requeued():
+    coord = Coordinator(list(range(4)), ("localhost", 0), KEY).start()
+    conn = Client(coord.address, authkey=KEY)
+    conn.send(("hello", "crash"))
+    conn.recv()
+    conn.send(("claim",))
+    assert conn.recv()[0] == "cfg"
+    conn.close()  # dies without reporting
+
+    threads, runs = _agents(coord, 2, lambda dev, cfg: 0)
+    assert coord.wait() == {i: 0 for i in range(4)}
+    for t in threads:
+        t.join(30)
+    assert sorted(i for r in runs for i in r) == [0, 1, 2, 3]
+
+
+def test_wrong_key_is_rejected():
+    coord = Coordinator([0], ("localhost", 0), KEY).start()
+    try:
+        with pytest.raises(Exception):
+            Client(coord.address, authkey=b"other")
+    finally:
+        coord.listener.close()
+
+
+def test_needs_a_key():
+    with pytest.raises(ValueError):
+        Coordinator([0])
@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from libwon.utils.misc import BatchedEarlyStopping, EarlyStopping
+
+
+def _streams(seed, n=16, epochs=30):
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.normal(size=(epochs, n)), 1)  # ties on purpose
+    values[rng.random((epochs, n)) < 0.1] = np.nan
+    values[0, 0] = np.nan  # a stream starting with nan
+    return values
+
+
+@pytest.mark.parametrize("patience", [0, 1, 3])
+@pytest.mark.parametrize("percentage,min_delta", [(False, 0), (False, 0.2), (True, 5)])
+@pytest.mark.parametrize("mode", ["min", "max"])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_batched_matches_scalar(seed, mode, percentage, min_delta, patience):
+    values = _streams(seed)
+    n = values.shape[1]
+    batched = BatchedEarlyStopping(n, mode, min_delta, patience, percentage)
+    scalar = [EarlyStopping("m", mode, min_delta, patience, percentage) for _ in range(n)]
+    for row in values:
+        stop = batched.step(row)
+        expected = [es.step_one(float(v)) for es, v in zip(scalar, row)]
+        np.testing.assert_array_equal(stop, expected)
+        np.testing.assert_array_equal(batched.best, [es.best for es in scalar])
+
+
+def test_patience_zero_always_better():
+    batched = BatchedEarlyStopping(3, patience=0)
+    assert batched.is_better(np.array([0.0, 1.0, -1.0]), np.ones(3)).all()
+    assert not batched.step([1.0, 2.0, 3.0]).any()
+    assert batched.step([0.0, 0.0, 0.0]).all()
+    np.testing.assert_array_equal(batched.best, [0.0, 0.0, 0.0])
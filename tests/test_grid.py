@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from libwon.utils.grid import Grid
+
+
+def old_get_configs(grid_list):
+    """the recursive expansion ParallelerGrid.get_configs used to do"""
+
+    def gen_config_one(grid):
+        configs = []
+        names = list(grid.keys())
+
+        def gen_config(ni, config):
+            if ni >= len(names):
+                configs.append(config.copy())
+                return
+            for p in grid[names[ni]]:
+                config[names[ni]] = p
+                gen_config(ni + 1, config)
+                del config[names[ni]]
+
+        gen_config(0, {})
+        return configs
+
+    configs = []
+    for g in grid_list if isinstance(grid_list, list) else [grid_list]:
+        configs.extend(gen_config_one(g))
+    return configs
+
+
+def _identity(cfg):
+    return tuple((k, type(v).__name__, repr(v)) for k, v in sorted(cfg.items()))
+
+
+def _dedup(configs):
+    seen, out = set(), []
+    for cfg in configs:
+        if _identity(cfg) not in seen:
+            seen.add(_identity(cfg))
+            out.append(cfg)
+    return out
+
+
+def _random_grid(seed):
+    rng = random.Random(seed)
+    pool = [0, 1, 2, 1.0, True, "a", "b", None, (1, 2)]
+    keys = ["lr", "seed", "layers", "act"]
+    grids = []
+    for _ in range(rng.randint(1, 4)):
+        ks = rng.sample(keys, rng.randint(1, 3)) if rng.random() < 0.3 else keys[:2]
+        grids.append({k: [rng.choice(pool) for _ in range(rng.randint(1, 4))] for k in ks})
+    return grids
+
+
+EXAMPLE = [{"seed": range(3), "info": [1]}, {"seed": [0], "info": range(3)}]
+
+
+@pytest.mark.parametrize("grid_list", [EXAMPLE, {"a": range(4), "b": "xy"}])
+def test_same_order_as_get_configs(grid_list):
+    old = old_get_configs(grid_list)
+    grid = Grid(grid_list)
+    assert len(grid) == len(old)
+    assert list(grid) == old
+    assert [grid[i] for i in range(len(grid))] == old
+    assert grid[-1] == old[-1]
+    with pytest.raises(IndexError):
+        grid[len(grid)]
+
+
+def test_example_duplicate_is_dropped():
+    grid = Grid(EXAMPLE)
+    unique = list(grid.unique())
+    assert len(unique) == grid.count_unique() == 5
+    assert [grid.is_dup(i) for i in range(len(grid))] == [False] * 4 + [True, False]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_dedup_and_shards_match_get_configs(seed):
+    grid_list = _random_grid(seed)
+    expected = _dedup(old_get_configs(grid_list))
+    grid = Grid(grid_list)
+    unique = list(grid.unique())
+    assert [_identity(c) for c in unique] == [_identity(c) for c in expected]
+    assert grid.count_unique() == len(expected)
+
+    world = 3
+    shards = [list(grid.shard(rank, world)) for rank in range(world)]
+    merged = sorted(_identity(c) for s in shards for c in s)
+    assert merged == sorted(_identity(c) for c in expected)
+
+
+def test_values_of_other_types_stay_distinct():
+    grid = Grid({"x": [1, 1.0, True, 1]})
+    assert len(grid) == 3
+    assert [type(c["x"]) for c in grid] == [int, float, bool]
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("torch", "numpy", "pandas")
+
+
+def _loaded(code):
+    """heavy modules in sys.modules after running code in a fresh interpreter"""
+    check = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run(
+        [sys.executable, "-c", check], env=env, capture_output=True, text=True, check=True
+    )
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import libwon",
+        "from libwon import COLLECTOR",
+        "import libwon.utils",
+        "from libwon.utils import EarlyStopping\n"
+        "es = EarlyStopping('acc', patience=2)\n"
+        "for v in [0.5, 0.6, float('nan')]: es.step(acc=v)",
+    ],
+)
+def test_no_heavy_imports(code):
+    assert _loaded(code) == []
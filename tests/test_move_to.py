@@ -0,0 +1,98 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from libwon.utils.misc import move_to, pack_tensors, unpack_tensors
+
+
+def _batch():
+    return {
+        "x": torch.randn(4, 3),
+        "y": [torch.arange(5), (torch.randn(2), "name", 7)],
+        "mask": torch.ones(3, dtype=torch.bool),
+        "ids": (torch.arange(2), torch.arange(3)),
+    }
+
+
+def _same(a, b):
+    assert type(a) is type(b)
+    if isinstance(a, dict):
+        assert list(a) == list(b)
+        for k in a:
+            _same(a[k], b[k])
+    elif isinstance(a, (list, tuple)):
+        assert len(a) == len(b)
+        for u, v in zip(a, b):
+            _same(u, v)
+    elif torch.is_tensor(a):
+        assert a.shape == b.shape and a.dtype == b.dtype
+    else:
+        assert a == b
+
+
+@pytest.fixture
+def copies(monkeypatch):
+    """devices the tensors were copied to by Tensor.to"""
+    moved = []
+    to = torch.Tensor.to
+
+    def counting_to(self, *args, **kwargs):
+        out = to(self, *args, **kwargs)
+        if out.device != self.device:
+            moved.append(out.device)
+        return out
+
+    monkeypatch.setattr(torch.Tensor, "to", counting_to)
+    return moved
+
+
+def test_batched_keeps_structure():
+    batch = _batch()
+    moved = move_to(batch, "meta", batched=True)
+    _same(batch, moved)
+    assert all(t.device.type == "meta" for t in _tensors(moved))
+
+
+def test_batched_one_copy_per_dtype(copies):
+    move_to(_batch(), "meta", batched=True)
+    assert len(copies) == 3  # float32, int64 and bool buffers
+
+
+def test_unbatched_one_copy_per_tensor(copies):
+    move_to(_batch(), "meta")
+    assert len(copies) == 6
+
+
+def test_same_device_is_not_copied(copies):
+    batch = _batch()
+    moved = move_to(batch, "cpu", batched=True)
+    assert not copies
+    assert moved["x"] is batch["x"]
+
+
+def test_pack_round_trip():
+    tensors = list(_tensors(_batch()))
+    buffers, layout = pack_tensors(tensors)
+    assert len(buffers) == 3
+    for a, b in zip(tensors, unpack_tensors(buffers, layout)):
+        assert torch.equal(a, b)
+
+
+def _tensors(obj):
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        for v in obj:
+            yield from _tensors(v)
+    elif torch.is_tensor(obj):
+        yield obj
+
+
+def test_only_pinned_host_to_cuda_is_async():
+    from libwon.utils.misc import _async_copy
+
+    cpu, cuda = torch.device("cpu"), torch.device("cuda", 0)
+    assert _async_copy(cpu, cuda, pinned=True)
+    assert not _async_copy(cpu, cuda, pinned=False)
+    assert not _async_copy(cuda, cpu, pinned=False)
+    assert not _async_copy(cuda, torch.device("cuda", 1), pinned=False)
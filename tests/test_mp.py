@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+from libwon.utils.mp import Command, mp_exec, mp_exec_trial
+
+
+def _exit_after(seconds, code):
+    script = f"import sys, time; time.sleep({seconds}); sys.exit({code})"
+    return Command([sys.executable, "-c", script])
+
+
+def test_exit_codes_in_config_order():
+    codes = [3, 0, 1, 4, 0, 2]
+    # the later configs exit first, the results still follow the configs
+    results = mp_exec(
+        [0, 0, 1],
+        list(range(len(codes))),
+        lambda dev, i: _exit_after(0.05 * (len(codes) - i), codes[i]),
+    )
+    assert results == codes
+
+
+def test_slots_never_oversubscribed():
+    lock = threading.Lock()
+    running = Counter()
+    peak = Counter()
+    ran = []
+
+    def func(dev, cfg):
+        with lock:
+            running[dev] += 1
+            peak[dev] = max(peak[dev], running[dev])
+            ran.append(cfg)
+        time.sleep(0.02)
+        with lock:
+            running[dev] -= 1
+        return cfg * 10
+
+    results = mp_exec(["a", "a", "b"], list(range(20)), func)
+    assert results == [cfg * 10 for cfg in range(20)]
+    assert sorted(ran) == list(range(20))
+    assert peak["a"] <= 2 and peak["b"] <= 1
+    assert peak["a"] == 2  # both slots of a were used
+
+
+def test_failed_job_does_not_stop_the_others():
+    def func(dev, cfg):
+        if cfg == 2:
+            raise ValueError("bad config")
+        return cfg
+
+    results = mp_exec([0, 1], list(range(5)), func)
+    assert isinstance(results[2], ValueError)
+    assert [r for i, r in enumerate(results) if i != 2] == [0, 1, 3, 4]
+
+
+def test_retry_until_done():
+    attempts = Counter()
+    flags_removed = Counter()
+
+    def func(dev, cfg):
+        attempts[cfg] += 1
+        return 0
+
+    mp_exec_trial(
+        [0, 1],
+        list(range(4)),
+        func,
+        check_done=lambda cfg: attempts[cfg] >= 1 + cfg % 2,
+        remove_run_flag=lambda cfg: flags_removed.update([cfg]),
+        trial_time=0,
+    )
+    # odd configs are undone after their first run and put back once
+    assert attempts == {0: 1, 1: 2, 2: 1, 3: 2}
+    assert flags_removed == {1: 1, 3: 1}
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from libwon.utils.mp import mp_exec
+from libwon.utils.resource import CapacityPool, FixedCapacity
+
+CAPS = {0: 24000, 1: 16000}
+
+
+def test_best_fit_and_release():
+    pool = CapacityPool([0, 1], FixedCapacity(CAPS))
+    assert pool.acquire(15000) == 1  # the tightest device that fits
+    assert pool.acquire(15000) == 0
+    assert pool.acquire(10000) is None  # 9000 and 1000 MB left
+    assert pool.acquire(9000) == 0
+    pool.release(1, 15000)
+    assert pool.acquire(10000) == 1
+    for dev, cost in [(0, 15000), (0, 9000), (1, 10000)]:
+        pool.release(dev, cost)
+    assert pool.used == {0: 0, 1: 0} and pool.jobs == {0: 0, 1: 0}
+
+
+def test_oversized_job_runs_alone():
+    pool = CapacityPool([0], FixedCapacity({0: 8000}))
+    assert pool.acquire(float("inf")) == 0
+    assert pool.acquire(1) is None
+    pool.release(0, float("inf"))
+    assert pool.used == {0: 0}
+
+
+def test_max_jobs():
+    pool = CapacityPool([0], FixedCapacity({0: 8000}), max_jobs=2)
+    assert [pool.acquire(100) for _ in range(3)] == [0, 0, None]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_mp_exec_never_oversubscribes(seed):
+    import random
+
+    rng = random.Random(seed)
+    costs = [rng.choice([2000, 6000, 9000, 15000, 30000]) for _ in range(30)]
+    pool = CapacityPool([0, 1], FixedCapacity(CAPS))
+    lock = threading.Lock()
+    used = Counter()
+    alone = Counter()
+    errors = []
+
+    def func(dev, i):
+        cost = min(costs[i], CAPS[dev])
+        with lock:
+            used[dev] += cost
+            if costs[i] > CAPS[dev]:
+                alone[dev] += 1
+            if used[dev] > CAPS[dev] or (alone[dev] and used[dev] != cost):
+                errors.append((dev, dict(used)))
+        time.sleep(rng.random() * 0.02)
+        with lock:
+            used[dev] -= cost
+            if costs[i] > CAPS[dev]:
+                alone[dev] -= 1
+        return dev
+
+    results = mp_exec(pool, list(range(len(costs))), func, cost=lambda i: costs[i])
+    assert not errors
+    assert None not in results
+    assert pool.used == {0: 0, 1: 0} and pool.jobs == {0: 0, 1: 0}